@@ -1,51 +1,139 @@
 from datetime import datetime
 from multiprocessing.pool import Pool
+from os import remove
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from tqdm import tqdm
 from unimodel.io.readers_nwp import read_moloch_grib
 
-from postproc.io.importers import import_nwp_grib
+from postproc.io.importers import import_nwp_grib, remove_imported_files
+from postproc.io.parquet import ModelParquetWriter, write_hive_partitions
 from postproc.utils.config import load_config
 from postproc.utils.dates import end_of_month
-from postproc.utils.geotools import get_model_points
+from postproc.utils.geotools import (
+    extract_points,
+    get_cached_interpolation_operator,
+    get_cached_model_points,
+    interpolate_points,
+)
 
+# Estat de cada procés del pool, inicialitzat una sola vegada
+_WORKER = {}
 
-def __get_model_data(grib_file, var, stepType):
 
-    grib_data = read_moloch_grib(grib_file, var, "cosmo-2I_er", {"stepType": stepType})
+def __init_worker(stations_md, variables, cache_dir, interpolation):
+    _WORKER["stations_md"] = stations_md
+    _WORKER["variables"] = variables
+    _WORKER["cache_dir"] = cache_dir
+    _WORKER["interpolation"] = interpolation
 
-    lead_times = grib_data.step.data.astype("timedelta64[h]").astype(int)
 
-    lsm = read_moloch_grib(grib_file, "fr_land", "cosmo-2I_er", {"stepType": "instant"})
+def __get_model_data(grib_data, var, stations_id, rows, cols, operator):
+
+    lead_times = grib_data.step.data.astype("timedelta64[h]").astype(int)
 
-    dict_row_col = get_model_points(lsm, stations_md)
+    model_run = np.datetime64(grib_data.time.data, "ns")
+
+    # Valors de totes les estacions i horitzons de cop, (estació, horitzó)
+    if operator is None:
+        values = extract_points(grib_data.values, rows, cols).T
+    else:
+        values = interpolate_points(operator, grib_data.values).T.astype(np.float32)
+
+    return pa.table(
+        {
+            "station_id": np.repeat(stations_id, len(lead_times)),
+            "run_datetime": np.full(values.size, model_run),
+            "lead_time": np.tile(lead_times, len(stations_id)),
+            "value": values.ravel(),
+            "variable": np.full(values.size, var),
+        }
+    )
+
+
+def __get_run_data(grib_file):
+    # Una passada per execució: màscara terra-mar i totes les variables
+    # en el mateix procés. Retorna les dades i el temps de cada etapa
+    timings = {"points": 0.0, "decode": 0.0, "extract": 0.0}
+    try:
+        time_0 = datetime.utcnow()
+        lsm = read_moloch_grib(
+            grib_file, "fr_land", "cosmo-2I_er", {"stepType": "instant"}
+        )
+        time_1 = datetime.utcnow()
+
+        # Posició de les estacions a la malla del model, només es calcula de
+        # nou si canvien la malla o les estacions
+        dict_row_col = get_cached_model_points(
+            lsm, _WORKER["stations_md"], _WORKER["cache_dir"]
+        )
+        operator = None
+        if _WORKER["interpolation"] != "nearest":
+            operator = get_cached_interpolation_operator(
+                lsm,
+                _WORKER["stations_md"],
+                _WORKER["cache_dir"],
+                _WORKER["interpolation"],
+            )
+        stations_id = np.array(list(dict_row_col), dtype=str)
+        rows = np.array([row for row, _ in dict_row_col.values()])
+        cols = np.array([col for _, col in dict_row_col.values()])
+        time_2 = datetime.utcnow()
 
-    model_run = pd.Timestamp(int(grib_data.time.data)).to_pydatetime()
+        timings["decode"] += (time_1 - time_0).total_seconds()
+        timings["points"] += (time_2 - time_1).total_seconds()
 
-    _model_data = []
+        run_data = []
+        for var in _WORKER["variables"]:
 
-    for station_id, coords in dict_row_col.items():
+            if var in ["tp", "vmax_10m"]:
+                stepType = "accum"
+            else:
+                stepType = "instant"
 
-        for i, lead_time in enumerate(lead_times):
-            _model_data.append(
-                {
-                    "station_id": station_id,
-                    "run_datetime": model_run,
-                    "lead_time": lead_time,
-                    "value": grib_data[i].values[coords[0], coords[1]],
-                    "variable": var,
-                }
+            time_0 = datetime.utcnow()
+            grib_data = read_moloch_grib(
+                grib_file, var, "cosmo-2I_er", {"stepType": stepType}
+            )
+            time_1 = datetime.utcnow()
+            run_data.append(
+                __get_model_data(grib_data, var, stations_id, rows, cols, operator)
             )
+            time_2 = datetime.utcnow()
 
-    return _model_data
+            timings["decode"] += (time_1 - time_0).total_seconds()
+            timings["extract"] += (time_2 - time_1).total_seconds()
+    except Exception as err:
+        print(grib_file, err)
+        return None, timings
+
+    return pa.concat_tables(run_data), timings
 
 
 if __name__ == "__main__":
 
     config = load_config("/home/ecm/projects/postproc-er/config_grib.json")
 
-    stations_md = pd.read_parquet(config["stations_metadata_pq"])
+    stations_md = pd.read_parquet(config["station_metadata_pq"])
+
+    # Format dels fitxers de model: 'long' (una fila per variable) o 'wide'
+    # (una columna per variable)
+    model_layout = config.get("model_layout", "long")
+
+    # Per defecte, un row group per execució. Amb 'model_row_group_size'
+    # cada execució es divideix en row groups d'horitzons consecutius, de
+    # manera que es poden ometre en llegir per horitzó
+    model_row_group_size = config.get("model_row_group_size")
+
+    # Amb 'hive', els fitxers mensuals es particionen per any, mes i horitzó
+    # (model_dir_pq/year=.../month=.../lead_time=...)
+    model_partitioning = config.get("model_partitioning")
+
+    # Mètode d'extracció dels punts: 'nearest' (punt de terra més proper),
+    # 'bilinear', 'idw' o 'knn_land'
+    interpolation = config.get("interpolation", "nearest")
 
     variables = [
         "2t",
@@ -69,52 +157,85 @@ if __name__ == "__main__":
 
     dates = pd.date_range(start_date, end_date, freq="1D")
 
-    model_data = []
+    # Temps acumulat de cada etapa (les dels processos es sumen entre ells)
+    timings = dict.fromkeys(["import", "points", "decode", "extract", "write"], 0.0)
+    n_runs = 0
 
     pbar = tqdm(total=len(dates), desc="Creating model parquet")
 
-    for date in dates:
-        try:
-            grib_file = import_nwp_grib(date, "cosmo-2I_er", config)
-            pbar.update(1)
-        except Exception as err:
-            if end_of_month(date) or date == dates[-1]:
-                pd.DataFrame(model_data).to_parquet(
-                    config["model_dir_pq"]
-                    + "cosmo_"
-                    + date.strftime("%Y%m")
-                    + ".parquet"
+    time_start = datetime.utcnow()
+
+    # Un únic pool per a tot el període. Les execucions d'un mes s'importen
+    # i després es reparteixen senceres entre els processos. Els fitxers
+    # importats es conserven fins que el mes s'ha escrit, ja que per defecte
+    # cada importació esborra els fitxers anteriors
+    with Pool(
+        processes=config.get("n_workers"),
+        initializer=__init_worker,
+        initargs=(
+            stations_md,
+            variables,
+            config["points_cache_dir"],
+            interpolation,
+        ),
+    ) as pool:
+        grib_files = []
+        for date in dates:
+            time_0 = datetime.utcnow()
+            try:
+                grib_files.append(
+                    import_nwp_grib(date, "cosmo-2I_er", config, keep_previous=True)
                 )
-                model_data = []
-                print("File saved.")
-            print(err)
-            continue
-
-        arguments = []
+            except Exception as err:
+                print(err)
+            timings["import"] += (datetime.utcnow() - time_0).total_seconds()
+            pbar.update(1)
 
-        for var in variables:
+            if not (end_of_month(date) or date == dates[-1]):
+                continue
 
-            if var in ["tp", "vmax_10m"]:
-                stepType = "accum"
+            # Cada execució s'escriu com a un row group tan bon punt arriba, i
+            # el fitxer només apareix a model_dir_pq quan el mes és complet
+            model_file = "cosmo_" + date.strftime("%Y%m") + ".parquet"
+            if model_partitioning == "hive":
+                model_file = config["nwp_dir"] + model_file
             else:
-                stepType = "instant"
-
-            arguments.append((grib_file, var, stepType))
-        try:
-            with Pool(processes=6) as pool:
-                pooled_model_data = pool.starmap(__get_model_data, arguments)
-        except Exception as err:
-            print(err)
-            continue
-
-        model_data = model_data + pooled_model_data
-
-        if end_of_month(date) or date == dates[-1]:
-            pd.DataFrame(model_data).to_parquet(
-                config["model_dir_pq"] + "cosmo_" + date.strftime("%Y%m") + ".parquet"
-            )
-            model_data = []
-            print("File saved.")
-
-        pbar.update(1)
+                model_file = config["model_dir_pq"] + model_file
+
+            with ModelParquetWriter(
+                model_file,
+                model_layout,
+                variables=variables,
+                row_group_size=model_row_group_size,
+            ) as writer:
+                for run_data, run_timings in pool.imap(__get_run_data, grib_files):
+                    for stage, seconds in run_timings.items():
+                        timings[stage] += seconds
+                    if run_data is not None:
+                        time_0 = datetime.utcnow()
+                        writer.write_run(run_data)
+                        timings["write"] += (datetime.utcnow() - time_0).total_seconds()
+            grib_files = []
+            remove_imported_files("cosmo-2I_er", config)
+
+            if writer.n_runs > 0:
+                if model_partitioning == "hive":
+                    time_0 = datetime.utcnow()
+                    write_hive_partitions(
+                        model_file,
+                        config["model_dir_pq"],
+                        "run_datetime",
+                        ["station_id", "run_datetime"],
+                        ["lead_time"],
+                    )
+                    remove(model_file)
+                    timings["write"] += (datetime.utcnow() - time_0).total_seconds()
+                n_runs += writer.n_runs
+                print("File saved.")
     pbar.close()
+
+    total_time = (datetime.utcnow() - time_start).total_seconds()
+    print(n_runs, "execucions en", round(total_time, 1), "segons.")
+    print(round(n_runs / total_time * 3600, 1), "execucions/hora.")
+    for stage, seconds in timings.items():
+        print("  " + stage + ":", round(seconds, 1), "segons.")
@@ -0,0 +1,171 @@
+"""Script per a l'entrenament d'un model de gradient boosting comú a totes les
+estacions i horitzons de pronòstic, i la comparació amb els models de Random
+Forest per estació (MAE, temps d'entrenament i d'inferència i mida).
+"""
+import pickle
+import traceback
+from datetime import datetime
+from glob import glob
+from os.path import getsize
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+
+from postproc.io.parquet import get_model_runs, get_station_var_data
+from postproc.io.training import TrainingDataProvider
+from postproc.methods.random_forest import (
+    RandomForestStore,
+    forecast_hourly,
+    forecast_pooled,
+    train_pooled_model,
+    train_rf_models,
+)
+from postproc.utils.config import load_config
+
+
+def get_mae(forecasts: dict, obs_data: pd.DataFrame) -> dict:
+    """Calculates the mean absolute error of several forecasts on the same
+    rows: forecasts are joined with each other and with the observations, and
+    only rows where all of them have a value are used.
+
+    Args:
+        forecasts (dict): Forecasts by name, with 'run_datetime',
+                          'station_id', 'lead_time' and 'forecast' columns.
+        obs_data (pd.DataFrame): Observations with 'station_id', 'datetime'
+                                 and 'value' columns.
+
+    Returns:
+        dict: Mean absolute error of each forecast.
+    """
+    keys = ["run_datetime", "station_id", "lead_time"]
+
+    data = None
+    for name, forecast in forecasts.items():
+        forecast = forecast[keys + ["forecast"]].rename(columns={"forecast": name})
+        data = forecast if data is None else data.merge(forecast, on=keys)
+
+    data = data.assign(
+        datetime=data["run_datetime"] + pd.to_timedelta(data["lead_time"], unit="hours")
+    )
+    data = data.merge(
+        obs_data[["station_id", "datetime", "value"]], on=["station_id", "datetime"]
+    ).dropna(subset=list(forecasts) + ["value"])
+
+    return {
+        name: float(np.mean(np.abs(data[name] - data["value"]))) for name in forecasts
+    }
+
+
+if __name__ == "__main__":
+
+    start_date = datetime(2020, 3, 1)
+    end_date = datetime(2023, 3, 1)
+    start_val_date = datetime(2023, 3, 1)
+    end_val_date = datetime(2024, 3, 31)
+
+    try:
+        config = load_config("/home/ecm/projects/postproc-er/config_grib.json")
+    except Exception as err:
+        print("Error while loading the configuration file.")
+        print(err)
+        raise
+
+    var = "2t"
+    model_parquet = config["model_dir_pq"] + "*.parquet"
+    station_parquet = config["station_dir_pq"] + "*.parquet"
+
+    stations_md = pd.read_parquet(config["station_metadata_pq"])
+    station_list = list(stations_md["station_id"])
+
+    run_datetime_0 = start_date.strftime("%Y-%m-%d %H:%M:%S")
+    run_datetime_1 = end_date.strftime("%Y-%m-%d %H:%M:%S")
+
+    print("[1/3] Entrenament - Inici")
+    try:
+        training_data = TrainingDataProvider(
+            model_parquet, station_parquet, [var], run_datetime_0, run_datetime_1
+        )
+
+        time_0 = datetime.utcnow()
+        pooled_model = train_pooled_model(
+            training_data.model_data,
+            training_data.get_station_var_data(var),
+            stations_md,
+            var,
+            lead_time_buckets=config["gradient_boosting"].get("lead_time_buckets"),
+        )
+        gb_train_time = (datetime.utcnow() - time_0).total_seconds()
+
+        with open(config["gradient_boosting"]["gb_model"], "wb") as f:
+            pickle.dump(pooled_model, f)
+
+        # Els models de Random Forest s'entrenen de nou, amb les mateixes
+        # dades, en un magatzem temporal per comparar-ne el temps
+        rf_dir = TemporaryDirectory()
+        store = RandomForestStore(rf_dir.name)
+        time_0 = datetime.utcnow()
+        for _ in train_rf_models(
+            station_list,
+            training_data.lead_times,
+            training_data,
+            var,
+            store,
+            n_workers=config["random_forest"].get("n_workers"),
+            n_jobs=config["random_forest"].get("n_jobs", 1),
+        ):
+            pass
+        rf_train_time = (datetime.utcnow() - time_0).total_seconds()
+    except Exception as err:
+        print("Error no controlat durant l'entrenament.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    print("[2/3] Validació - Inici")
+    try:
+        model_val = get_model_runs(
+            config["model_dir_pq"], start_val_date, end_val_date, layout=None
+        )
+        obs_val = get_station_var_data(
+            station_parquet,
+            var,
+            start_val_date.strftime("%Y-%m-%d %H:%M:%S"),
+            end_val_date.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        n_runs = model_val["run_datetime"].nunique()
+
+        time_0 = datetime.utcnow()
+        forecast_gb = forecast_pooled(
+            model_val, station_list, pooled_model, stations_md
+        )
+        gb_time = (datetime.utcnow() - time_0).total_seconds()
+
+        time_0 = datetime.utcnow()
+        forecast_rf = forecast_hourly(model_val, station_list, var, config, store)
+        rf_time = (datetime.utcnow() - time_0).total_seconds()
+    except Exception as err:
+        print("Error no controlat durant la validació.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    gb_size = len(pickle.dumps(pooled_model))
+    rf_size = sum(getsize(f) for f in glob(store.store_dir + "/*.npy"))
+    rf_dir.cleanup()
+
+    # Els dos pronòstics s'avaluen sobre les mateixes files
+    mae = get_mae({"gb": forecast_gb, "rf": forecast_rf}, obs_val)
+
+    print("[3/3] Comparació")
+    print(
+        pd.DataFrame(
+            {
+                "MAE": [mae["gb"], mae["rf"]],
+                "entrenament (min)": [gb_train_time / 60, rf_train_time / 60],
+                "inferència per passada (s)": [gb_time / n_runs, rf_time / n_runs],
+                "mida (MB)": [gb_size / 1e6, rf_size / 1e6],
+            },
+            index=["gradient boosting", "random forest"],
+        ).to_string()
+    )
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 """Script principal per a l'execució del MOS.
 """
+import argparse
 import traceback
 from datetime import datetime
 
@@ -10,16 +11,19 @@ import pandas as pd
 
 from postproc.methods.mos import Forecaster
 
-from postproc.io.parquet import get_model_run
+from postproc.io.parquet import get_model_run, get_model_runs
 
 from postproc.utils.config import load_config
 
+# Columnes dels pronòstics, també per als fitxers buits
+FORECAST_COLUMNS = ["run_datetime", "station_id", "lead_time", "forecast"]
+
 
 def forecast_hourly(
     model_data: pd.DataFrame,
     stations_id: list,
     predictand: str,
-    regression_file: str,
+    regression: Forecaster,
     config: dict,
 ) -> pd.DataFrame:
     """Obtains hourly forecasts of a specified predictand for each station in
@@ -29,21 +33,68 @@ def forecast_hourly(
         model_data (DataFrame): Data from a NWP model for specific points.
         stations_id (list): Station id points to obtain a forecast.
         predictand (str): Variable to forecast.
+        regression (Forecaster): MOS regressions.
         config (dict): Configuration dictionary.
 
     Returns:
         DataFrame: Hourly forecast for a specific variable and for each
                    station.
     """
-    regression = Forecaster(regression_file)
+    model_data = model_data.loc[model_data["lead_time"] < config["lead_times"]]
+    results = regression.forecast_runs(model_data, predictand, stations_id)
+
+    return results
+
+
+def forecast_backfill(
+    start_date: datetime,
+    end_date: datetime,
+    stations_id: list,
+    predictand: str,
+    regression: Forecaster,
+    config: dict,
+    block_runs: int = 31,
+) -> pd.DataFrame:
+    """Obtains hourly forecasts of a specified predictand for each station in
+    stations_id and for all model runs between start_date and end_date. Model
+    data for the whole period is read in one scan and forecasts are
+    calculated in blocks of block_runs model runs.
+
+    Args:
+        start_date (datetime): First model run.
+        end_date (datetime): Last model run.
+        stations_id (list): Station id points to obtain a forecast.
+        predictand (str): Variable to forecast.
+        regression (Forecaster): MOS regressions.
+        config (dict): Configuration dictionary.
+        block_runs (int, optional): Number of model runs forecasted at once.
+                                    Defaults to 31.
+
+    Returns:
+        DataFrame: Hourly forecast for a specific variable, for each station
+                   and model run.
+    """
+    model_data = get_model_runs(
+        config["model_dir_pq"], start_date, end_date, layout=None
+    )
+    if len(model_data) == 0:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    # Model data is sorted by run, so each block is a contiguous slice
+    run_datetime = model_data["run_datetime"].to_numpy()
+    runs = pd.unique(run_datetime)
+    bounds = run_datetime.searchsorted(runs[::block_runs])
+    bounds = list(bounds) + [len(model_data)]
 
     results = []
-    for lead_time in range(config["lead_times"]):
-        model_lt = model_data.loc[model_data["lead_time"] == lead_time]
-        fct_hourly = regression.forecast_points(stations_id, model_lt, predictand)
-        results = results + fct_hourly
+    for i_0, i_1 in zip(bounds[:-1], bounds[1:]):
+        results.append(
+            forecast_hourly(
+                model_data.iloc[i_0:i_1], stations_id, predictand, regression, config
+            )
+        )
 
-    return results
+    return pd.concat(results, ignore_index=True)
 
 
 def main():
@@ -58,6 +109,14 @@ def main():
 
     dates = pd.date_range(start_date, end_date, freq="1D")
 
+    try:
+        regression = Forecaster(config["regressions_pq"])
+    except Exception as err:
+        print("Error recuperant el fitxer de les regressions.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
     resultat_2t = []
 
     for date in dates:
@@ -67,15 +126,7 @@ def main():
         time_0 = datetime.utcnow()
 
         try:
-            regression_file = (config["regressions_pq"])
-        except Exception as err:
-            print("Error recuperant el fitxer de les regressions.")
-            print(err)
-            print(traceback.format_exc())
-            raise
-
-        try:
-            model_data = get_model_run(config["model_dir_pq"], date)
+            model_data = get_model_run(config["model_dir_pq"], date, layout=None)
             if len(model_data) == 0:
                 print("No hi ha dades de model per a aquest dia.")
                 continue
@@ -93,10 +144,10 @@ def main():
 
         try:
             result_2t = forecast_hourly(
-                model_data, stations_id, "2t", regression_file, config
+                model_data, stations_id, "2t", regression, config
             )
 
-            resultat_2t = resultat_2t + result_2t
+            resultat_2t.append(result_2t)
         except Exception as err:
             print("Error durant el pronòstic horari.")
             print(err)
@@ -107,10 +158,65 @@ def main():
         elapsed_time = (datetime.utcnow() - time_0).total_seconds() / 60
         print("Temps d'execució: %2.2f minuts.", round(elapsed_time, 1))
 
-    pd.DataFrame(resultat_2t).to_parquet("forecast_mos_2t_2d.parquet")
+    # Si cap dia té dades de model, s'escriu un fitxer buit
+    if resultat_2t:
+        resultat_2t = pd.concat(resultat_2t)
+    else:
+        resultat_2t = pd.DataFrame(columns=FORECAST_COLUMNS)
+    resultat_2t.to_parquet("forecast_mos_2t_2d.parquet")
+    print("Pronòstic MOS - OK")
+
+
+def main_backfill():
+    """Main function of the script in backfill mode. All model runs are read
+    at once and forecasted in blocks."""
+    config = load_config("config_pymos_tfm.json")
+
+    stations_md = pd.read_parquet(config["station_metadata_pq"])
+    stations_id = list(stations_md["station_id"])
+
+    start_date = datetime(2023, 3, 1)
+    end_date = datetime(2024, 3, 31)
+
+    time_0 = datetime.utcnow()
+
+    try:
+        regression = Forecaster(config["regressions_pq"])
+    except Exception as err:
+        print("Error recuperant el fitxer de les regressions.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    try:
+        resultat_2t = forecast_backfill(
+            start_date, end_date, stations_id, "2t", regression, config
+        )
+    except Exception as err:
+        print("Error durant el pronòstic horari.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+    print("Pronòstic horari 2t - OK")
+
+    elapsed_time = (datetime.utcnow() - time_0).total_seconds() / 60
+    print("Temps d'execució: %2.2f minuts.", round(elapsed_time, 1))
+
+    resultat_2t.to_parquet("forecast_mos_2t_2d.parquet")
     print("Pronòstic MOS - OK")
 
 
 if __name__ == "__main__":
 
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Forecast all model runs of the period in one batch.",
+    )
+    args = parser.parse_args()
+
+    if args.backfill:
+        main_backfill()
+    else:
+        main()
@@ -8,9 +8,9 @@ from datetime import datetime
 import pandas as pd
 from tqdm import tqdm
 
-from postproc.methods.mos import train_regressions
+from postproc.io.parquet import ParquetReader, get_training_matrix
+from postproc.methods.mos import train_matrix_regressions, train_matrix_statistics
 from postproc.utils.config import load_config
-from postproc.io.parquet import get_model_lt_data, get_station_var_data
 
 
 if __name__ == "__main__":
@@ -25,10 +25,14 @@ if __name__ == "__main__":
         print(err)
         raise
 
-    lead_times = config["lead_times"]
+    lead_times = range(config["lead_times"])
     vars_to_train = ["2t"]
     model_parquet = config["model_dir_pq"] + "*.parquet"
     station_parquet = config["station_dir_pq"] + "*.parquet"
+    # Fitxers de sortida, llegits abans de l'entrenament perquè una clau que
+    # falti no es detecti després de tot el càlcul
+    regressions_pq = config["regressions_pq"]
+    statistics_pq = config["statistics_pq"]
 
     metadata = pd.read_parquet(config["station_metadata_pq"])
     station_list = list(metadata["station_id"])
@@ -42,43 +46,50 @@ if __name__ == "__main__":
 
     print("[1/2] Entrenament - Inici")
     regressions = []
+    statistics = []
     try:
-        for lead_time in lead_times:
-            pbar = tqdm(
-                total=len(station_list) * len(vars_to_train),
-                desc="Entrenament - lt " + str(lead_time),
-            )
-            for var in vars_to_train:
-                model_data = get_model_lt_data(
-                    model_parquet, lead_time, run_datetime_0, run_datetime_1
+        # Una sola consulta per variable construeix la matriu d'entrenament de
+        # totes les estacions i horitzons, sense files amb valors nuls. Els
+        # estadístics suficients es calculen per a tots els grups, les
+        # regressions només per als que tenen prou mostres
+        with ParquetReader() as reader:
+            for var in tqdm(vars_to_train, desc="Entrenament"):
+                training_matrix, slices, predictors = get_training_matrix(
+                    model_parquet,
+                    station_parquet,
+                    var,
+                    run_datetime_0,
+                    run_datetime_1,
+                    min_samples=1,
+                    stations=station_list,
+                    reader=reader,
                 )
-
-                station_data = get_station_var_data(
-                    station_parquet, var, run_datetime_0, run_datetime_1
-                )
-
-                for station in station_list:
-                    regressions.append(
-                        train_regressions(
-                            station, model_data, station_data, lead_time, var
-                        )
+                slices = {
+                    key: rows for key, rows in slices.items() if key[1] in lead_times
+                }
+                regressions.extend(
+                    train_matrix_regressions(
+                        training_matrix,
+                        slices,
+                        predictors,
+                        var,
+                        n_workers=config.get("n_workers"),
                     )
-                    pbar.update(1)
-            print("      Horitzó pronòstic " + str(lead_time).zfill(2) + " - OK")
-            pbar.close()
+                )
+                statistics.extend(
+                    train_matrix_statistics(training_matrix, slices, predictors, var)
+                )
+                print("      Variable " + var + " - OK")
     except Exception as err:
         print("Error no controlat durant l'entrenament.")
         print(err)
         print(traceback.format_exc())
         raise
 
-    # Eliminem els None per aquells casos en què no hi ha dades i no es pot
-    # entrenar
-    regressions = [regr for regr in regressions if regr is not None]
-
-    # Guardem les regressions en un fitxer .parquet
+    # Guardem les regressions i els estadístics suficients en fitxers .parquet
     try:
-        pd.DataFrame(regressions).to_parquet(config["regressions_pq"])
+        pd.DataFrame(regressions).to_parquet(regressions_pq)
+        pd.DataFrame(statistics).to_parquet(statistics_pq)
     except Exception as err:
         print("Error durant la conversió a .parquet del DataFrame.")
         print(err)
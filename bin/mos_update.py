@@ -0,0 +1,97 @@
+"""Script per a l'actualització incremental de les regressions a partir dels
+estadístics suficients guardats i de les dades d'un nou període.
+"""
+import traceback
+from datetime import datetime
+
+import pandas as pd
+from tqdm import tqdm
+
+from postproc.io.parquet import ParquetReader, get_training_matrix
+from postproc.methods.mos import train_matrix_statistics, update_regressions
+from postproc.utils.config import load_config
+
+
+if __name__ == "__main__":
+    # Període nou, posterior a l'últim entrenament o actualització
+    start_date = datetime(2023, 2, 1, 1)
+    end_date = datetime(2023, 3, 1)
+
+    try:
+        config = load_config("/home/ecm/projects/postproc-er/config_grib.json")
+    except Exception as err:
+        print("Error while loading the configuration file.")
+        print(err)
+        raise
+
+    lead_times = range(config["lead_times"])
+    vars_to_train = ["2t"]
+    model_parquet = config["model_dir_pq"] + "*.parquet"
+    station_parquet = config["station_dir_pq"] + "*.parquet"
+
+    metadata = pd.read_parquet(config["station_metadata_pq"])
+    station_list = list(metadata["station_id"])
+
+    run_datetime_0 = start_date.strftime("%Y-%m-%d %H:%M:%S")
+    run_datetime_1 = end_date.strftime("%Y-%m-%d %H:%M:%S")
+
+    print("[1/3] Estadístics del nou període - Inici")
+    statistics = pd.read_parquet(config["statistics_pq"])
+    old_regressions = pd.read_parquet(config["regressions_pq"])
+    new_statistics = []
+    try:
+        # Mateix camí que mos_train: matriu d'entrenament sense files amb
+        # valors nuls i amb els predictors dels estadístics guardats, de
+        # manera que es poden sumar
+        with ParquetReader() as reader:
+            for var in tqdm(vars_to_train, desc="Estadístics"):
+                stored = statistics[statistics["predictand"] == var]
+                predictors = None
+                if len(stored) > 0:
+                    predictors = list(stored["predictors"].iloc[0])
+                training_matrix, slices, predictors = get_training_matrix(
+                    model_parquet,
+                    station_parquet,
+                    var,
+                    run_datetime_0,
+                    run_datetime_1,
+                    predictors=predictors,
+                    min_samples=1,
+                    stations=station_list,
+                    reader=reader,
+                )
+                slices = {
+                    key: rows for key, rows in slices.items() if key[1] in lead_times
+                }
+                new_statistics.extend(
+                    train_matrix_statistics(training_matrix, slices, predictors, var)
+                )
+    except Exception as err:
+        print("Error no controlat durant el càlcul dels estadístics.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    print("[2/3] Actualització de les regressions - Inici")
+    try:
+        statistics, regressions = update_regressions(
+            statistics,
+            pd.DataFrame(new_statistics),
+            old_regressions,
+        )
+    except Exception as err:
+        print("Error durant l'actualització de les regressions.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    try:
+        statistics.to_parquet(config["statistics_pq"])
+        regressions.to_parquet(config["regressions_pq"])
+    except Exception as err:
+        print("Error durant la conversió a .parquet del DataFrame.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    print("[3/3] Actualització - OK")
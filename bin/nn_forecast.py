@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""Script principal per a l'execució del pronòstic de la xarxa neuronal.
+"""
+import argparse
+import traceback
+from datetime import datetime
+
+import pandas as pd
+
+from postproc.io.parquet import get_model_run, get_model_runs
+from postproc.methods.dnn_runtime import DnnRuntime, forecast_hourly
+from postproc.utils.config import load_config
+
+# Columnes dels pronòstics, també per als fitxers buits
+FORECAST_COLUMNS = ["run_datetime", "station_id", "lead_time", "forecast"]
+
+
+def forecast_backfill(
+    start_date: datetime,
+    end_date: datetime,
+    stations_id: list,
+    runtime: DnnRuntime,
+    station_tokens: pd.DataFrame,
+    config: dict,
+    block_runs: int = 31,
+) -> pd.DataFrame:
+    """Obtains hourly forecasts for each station in stations_id and for all
+    model runs between start_date and end_date. Model data for the whole
+    period is read in one scan and forecasts are calculated in blocks of
+    block_runs model runs.
+
+    Args:
+        start_date (datetime): First model run.
+        end_date (datetime): Last model run.
+        stations_id (list): Station id points to obtain a forecast.
+        runtime (DnnRuntime): DNN model.
+        station_tokens (pd.DataFrame): Token of each station.
+        config (dict): Configuration dictionary.
+        block_runs (int, optional): Number of model runs forecasted at once.
+                                    Defaults to 31.
+
+    Returns:
+        DataFrame: Hourly forecast for each station and model run.
+    """
+    model_data = get_model_runs(
+        config["model_dir_pq"], start_date, end_date, layout=None
+    )
+    model_data = model_data.loc[model_data["lead_time"] < config["lead_times"]]
+    if len(model_data) == 0:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    # Model data is sorted by run, so each block is a contiguous slice
+    run_datetime = model_data["run_datetime"].to_numpy()
+    runs = pd.unique(run_datetime)
+    bounds = run_datetime.searchsorted(runs[::block_runs])
+    bounds = list(bounds) + [len(model_data)]
+
+    results = []
+    for i_0, i_1 in zip(bounds[:-1], bounds[1:]):
+        results.append(
+            forecast_hourly(
+                model_data.iloc[i_0:i_1], stations_id, runtime, station_tokens
+            )
+        )
+
+    return pd.concat(results, ignore_index=True)
+
+
+def load_model(config: dict) -> tuple:
+    """Loads the DNN weights and the station tokens.
+
+    Args:
+        config (dict): Configuration dictionary.
+
+    Returns:
+        tuple: DNN model and station tokens.
+    """
+    try:
+        runtime = DnnRuntime(config["neural_network"]["dnn_weights"])
+        station_tokens = pd.read_parquet(config["neural_network"]["station_tokens_pq"])
+    except Exception as err:
+        print("Error recuperant el model de xarxa neuronal.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+
+    return runtime, station_tokens
+
+
+def main():
+    """Main function of the script."""
+    config = load_config("config_pymos_tfm.json")
+
+    stations_md = pd.read_parquet(config["station_metadata_pq"])
+    stations_id = list(stations_md["station_id"])
+
+    start_date = datetime(2023, 3, 1)
+    end_date = datetime(2024, 3, 31)
+
+    dates = pd.date_range(start_date, end_date, freq="1D")
+
+    runtime, station_tokens = load_model(config)
+
+    resultat_2t = []
+
+    for date in dates:
+        print(
+            "Inici del càlcul de la xarxa neuronal pel %s",
+            date.strftime("%Y-%m-%d %H") + ".",
+        )
+        time_0 = datetime.utcnow()
+
+        try:
+            model_data = get_model_run(config["model_dir_pq"], date, layout=None)
+            if len(model_data) == 0:
+                print("No hi ha dades de model per a aquest dia.")
+                continue
+        except Exception as err:
+            print("Error durant la importació del model.")
+            print(err)
+            print(traceback.format_exc())
+            raise
+        print("Importació del model - OK")
+
+        try:
+            model_data = model_data.loc[model_data["lead_time"] < config["lead_times"]]
+            resultat_2t.append(
+                forecast_hourly(model_data, stations_id, runtime, station_tokens)
+            )
+        except Exception as err:
+            print("Error durant el pronòstic horari.")
+            print(err)
+            print(traceback.format_exc())
+            raise
+        print("Pronòstic horari 2t - OK")
+
+        elapsed_time = (datetime.utcnow() - time_0).total_seconds()
+        print("Temps d'execució: " + str(round(elapsed_time, 3)) + " segons.")
+
+    # Si cap dia té dades de model, s'escriu un fitxer buit
+    if resultat_2t:
+        resultat_2t = pd.concat(resultat_2t)
+    else:
+        resultat_2t = pd.DataFrame(columns=FORECAST_COLUMNS)
+    resultat_2t.to_parquet("forecast_nn_2t.parquet")
+    print("Pronòstic xarxa neuronal - OK")
+
+
+def main_backfill():
+    """Main function of the script in backfill mode. All model runs are read
+    at once and forecasted in blocks."""
+    config = load_config("config_pymos_tfm.json")
+
+    stations_md = pd.read_parquet(config["station_metadata_pq"])
+    stations_id = list(stations_md["station_id"])
+
+    start_date = datetime(2023, 3, 1)
+    end_date = datetime(2024, 3, 31)
+
+    runtime, station_tokens = load_model(config)
+
+    time_0 = datetime.utcnow()
+    try:
+        resultat_2t = forecast_backfill(
+            start_date, end_date, stations_id, runtime, station_tokens, config
+        )
+    except Exception as err:
+        print("Error durant el pronòstic horari.")
+        print(err)
+        print(traceback.format_exc())
+        raise
+    print("Pronòstic horari 2t - OK")
+
+    elapsed_time = (datetime.utcnow() - time_0).total_seconds()
+    n_runs = max(resultat_2t["run_datetime"].nunique(), 1)
+    print(
+        "Temps d'execució: "
+        + str(round(elapsed_time, 1))
+        + " segons, "
+        + str(round(elapsed_time / n_runs, 3))
+        + " segons per passada."
+    )
+
+    resultat_2t.to_parquet("forecast_nn_2t.parquet")
+    print("Pronòstic xarxa neuronal - OK")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Forecast all model runs of the period in one batch.",
+    )
+    args = parser.parse_args()
+
+    if args.backfill:
+        main_backfill()
+    else:
+        main()
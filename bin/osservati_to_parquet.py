@@ -4,9 +4,11 @@ import gzip
 import json
 from datetime import datetime
 from glob import glob
+from os import remove
 from os.path import basename
 
 import pandas as pd
+from postproc.io.parquet import write_hive_partitions
 from postproc.utils.config import load_config
 
 
@@ -14,7 +16,7 @@ if __name__ == "__main__":
 
     config = load_config("config_grib.json")
 
-    osservati_files = glob(config["station_dir_source"])
+    osservati_files = sorted(glob(config["station_dir_source"]))
 
     for osservati_file in osservati_files:
 
@@ -50,8 +52,18 @@ if __name__ == "__main__":
 
         osservati_data = pd.DataFrame(osservati_data)
 
-        osservati_data.to_parquet(
-            config["station_dir_pq"] + basename(osservati_file)[:7] + ".parquet"
-        )
+        # Amb 'hive', les observacions es particionen per any i mes
+        # (station_dir_pq/year=.../month=...)
+        if config.get("station_partitioning") == "hive":
+            tmp_file = config["nwp_dir"] + basename(osservati_file)[:7] + ".parquet"
+            osservati_data.to_parquet(tmp_file)
+            write_hive_partitions(
+                tmp_file, config["station_dir_pq"], "datetime", ["id", "datetime"]
+            )
+            remove(tmp_file)
+        else:
+            osservati_data.to_parquet(
+                config["station_dir_pq"] + basename(osservati_file)[:7] + ".parquet"
+            )
 
         print("Fitxer " + basename(osservati_file)[:7] + ".parquet guardat.")
@@ -1,17 +1,15 @@
 """Script per a l'entrenament dels punts d'estacions i l'obtenció d'un
-fitxer .pickle amb els models de Random Forest.
+magatzem amb els models de Random Forest.
 """
-import pickle
 import sys
 import traceback
-from collections import defaultdict
 from datetime import datetime
 
 import pandas as pd
 from tqdm import tqdm
 
-from postproc.io.parquet import get_model_lt_data, get_station_var_data
-from postproc.methods.random_forest import train_rf_model
+from postproc.io.parquet import ParquetReader, get_training_matrix
+from postproc.methods.random_forest import RandomForestStore, train_matrix_rf_models
 from postproc.utils.config import load_config
 
 if __name__ == "__main__":
@@ -46,47 +44,47 @@ if __name__ == "__main__":
 
     print("[1/2] Entrenament - Inici")
     try:
-        for lead_time in lead_times:
-            regressions = defaultdict(list)
-            pbar = tqdm(
-                total=len(station_list) * len(vars_to_train),
-                desc="Entrenament - lt " + str(lead_time),
-            )
-            for var in vars_to_train:
-                model_data = get_model_lt_data(
-                    model_parquet, lead_time, run_datetime_0, run_datetime_1
-                )
+        store = RandomForestStore(config["random_forest"]["rf_store"])
+        time_0 = datetime.utcnow()
 
-                station_data = get_station_var_data(
-                    station_parquet, var, run_datetime_0, run_datetime_1
+        # Cada model es guarda al magatzem quan s'acaba d'entrenar i els que
+        # ja hi són s'ometen, de manera que es pot reprendre l'entrenament
+        with ParquetReader() as reader:
+            for var in vars_to_train:
+                # Matriu d'entrenament de totes les estacions i horitzons amb
+                # prou mostres, sense files amb valors nuls
+                training_matrix, slices, predictors = get_training_matrix(
+                    model_parquet,
+                    station_parquet,
+                    var,
+                    run_datetime_0,
+                    run_datetime_1,
+                    stations=station_list,
+                    reader=reader,
                 )
-                station_data = station_data.dropna()
-
-                for station in station_list:
-                    regr = train_rf_model(station, model_data, station_data, var)
-                    if regr is not None:
-                        regressions[station].append(regr)
-                    pbar.update(1)
-            print("      Horitzó pronòstic " + str(lead_time).zfill(2) + " - OK")
-            pbar.close()
-
-            # Eliminem els None per aquells casos en què no hi ha dades i no es pot
-            # entrenar
-            # regressions = [regr for regr in regressions if regr is not None]
-
-            # Guardem les regressions en un fitxer .parquet
-            try:
-                with open(
-                    "random_forest_regressions_lt_" + str(lead_time) + ".pickle", "wb"
-                ) as f:
-                    pickle.dump(regressions, f)
-                regressions = None
-                del regressions
-            except Exception as err:
-                print("Error durant la conversió a .parquet del DataFrame.")
-                print(err)
-                print(traceback.format_exc())
-                raise
+                slices = {
+                    key: rows for key, rows in slices.items() if key[1] in lead_times
+                }
+
+                n_models = 0
+                for _, _, saved in tqdm(
+                    train_matrix_rf_models(
+                        training_matrix,
+                        slices,
+                        predictors,
+                        var,
+                        store,
+                        n_workers=config["random_forest"].get("n_workers"),
+                        n_jobs=config["random_forest"].get("n_jobs", 1),
+                    ),
+                    total=len(slices),
+                    desc="Entrenament - " + var,
+                ):
+                    n_models += saved
+                print("      " + str(n_models) + " models nous - OK")
+
+        elapsed_time = (datetime.utcnow() - time_0).total_seconds() / 60
+        print("Temps d'entrenament: " + str(round(elapsed_time, 1)) + " minuts.")
 
     except Exception as err:
         print("Error no controlat durant l'entrenament.")
@@ -30,7 +30,11 @@ def __get_datetime_formatted__(date: datetime) -> dict:
 
 
 def import_nwp_grib(
-    date_run: datetime, model: str, config: dict, lead_time: int = None
+    date_run: datetime,
+    model: str,
+    config: dict,
+    lead_time: int = None,
+    keep_previous: bool = False,
 ) -> str:
     """Imports a NWP model grib file.
 
@@ -46,6 +50,11 @@ def import_nwp_grib(
                        'compressed': src is a compressed file}}.
         lead_time (int, optional): Lead time of the NWP grib to import if
                                    'compacted' is False. Defaults to None.
+        keep_previous (bool, optional): Keep the files imported before, e.g.
+                                        while they are still being read, and
+                                        remove them later with
+                                        remove_imported_files. Defaults to
+                                        False.
 
     Raises:
         KeyError: If 'model' not in the configuration dictionary.
@@ -67,6 +76,9 @@ def import_nwp_grib(
 
     prev_files_tar = glob(model_dir + "*.zip")
     prev_files = glob(model_dir + "*[!.zip]")
+    if keep_previous:
+        prev_files_tar = []
+        prev_files = []
 
     date_run_f = __get_datetime_formatted__(date_run)
 
@@ -131,3 +143,15 @@ def import_nwp_grib(
             raise FileNotFoundError(nwp_file + " not found.")
 
     return model_dir + basename(nwp_file)
+
+
+def remove_imported_files(model: str, config: dict):
+    """Removes the files of a NWP model imported with import_nwp_grib.
+
+    Args:
+        model (str): Alias of the NWP model selected.
+        config (dict): Configuration dictionary, see import_nwp_grib.
+    """
+    model_dir = config["nwp_dir"] + model + "/"
+    for prev_file in glob(model_dir + "*.zip") + glob(model_dir + "*[!.zip]"):
+        remove(prev_file)
@@ -1,56 +1,986 @@
+from glob import glob
+from os import getpid, makedirs, remove, replace
+from os.path import basename, dirname, exists, isdir, join, relpath
+from shutil import rmtree
+
 import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame
+
+from postproc.utils.arrays import group_slices
+
+# Columns identifying a row of NWP model data in the wide layout
+MODEL_KEYS = ["station_id", "run_datetime", "lead_time"]
+
+LAYOUTS = ["long", "wide", None]
+
+# Partition keys of hive partitioned datasets which are not data columns
+DERIVED_PARTITIONS = ["year", "month"]
+
+
+def is_wide_layout(model_data: DataFrame) -> bool:
+    """Checks the layout of NWP model data. The long layout has a row per
+    (station_id, run_datetime, lead_time, variable) with 'variable' and
+    'value' columns, and the wide layout a row per (station_id, run_datetime,
+    lead_time) with the valid 'datetime' and a column per variable.
+
+    Args:
+        model_data (pd.DataFrame): NWP model data.
+
+    Returns:
+        bool: True if model data is in wide layout.
+    """
+    return "variable" not in model_data.columns
+
+
+def get_model_variables(model_data: DataFrame) -> list:
+    """Returns the NWP variables of model data in any layout, sorted by name.
+
+    Args:
+        model_data (pd.DataFrame): NWP model data.
+
+    Returns:
+        list: Variable names.
+    """
+    if is_wide_layout(model_data):
+        return sorted(
+            column
+            for column in model_data.columns
+            if column not in MODEL_KEYS + ["datetime"]
+        )
+
+    return sorted(model_data["variable"].unique())
+
+
+def to_wide_layout(model_data: DataFrame) -> DataFrame:
+    """Pivots NWP model data to the wide layout, sorted by (station_id,
+    run_datetime, lead_time). Data already in wide layout is returned as it
+    is.
+
+    Args:
+        model_data (pd.DataFrame): NWP model data.
+
+    Returns:
+        pd.DataFrame: NWP model data in wide layout.
+    """
+    if is_wide_layout(model_data):
+        return model_data
+
+    wide_data = (
+        model_data.drop_duplicates(MODEL_KEYS + ["variable"])
+        .pivot(index=MODEL_KEYS, columns="variable", values="value")
+        .reset_index()
+    )
+    wide_data.columns.name = None
+    dt_column = wide_data["run_datetime"] + pd.to_timedelta(
+        wide_data["lead_time"], unit="hours"
+    )
+    wide_data.insert(3, "datetime", dt_column)
+
+    return wide_data
+
+
+def to_long_layout(model_data: DataFrame) -> DataFrame:
+    """Unpivots NWP model data to the long layout. Missing values are dropped
+    and data already in long layout is returned as it is.
+
+    Args:
+        model_data (pd.DataFrame): NWP model data.
+
+    Returns:
+        pd.DataFrame: NWP model data in long layout.
+    """
+    if not is_wide_layout(model_data):
+        return model_data
+
+    long_data = model_data.melt(
+        id_vars=MODEL_KEYS,
+        value_vars=get_model_variables(model_data),
+        var_name="variable",
+        value_name="value",
+    ).dropna(subset=["value"])
+    long_data["value"] = long_data["value"].astype(float)
+
+    return long_data[MODEL_KEYS + ["value", "variable"]].reset_index(drop=True)
+
+
+def _drop_missing(model_data: DataFrame) -> DataFrame:
+    # In wide layout a row is only dropped if all variables are missing, as
+    # a pivot of the long layout without missing values would do
+    if is_wide_layout(model_data):
+        return model_data.dropna(subset=get_model_variables(model_data), how="all")
+
+    return model_data.dropna()
+
+
+def _as_layout(model_data: DataFrame, layout: str) -> DataFrame:
+    if layout == "long":
+        return to_long_layout(model_data)
+    if layout == "wide":
+        return to_wide_layout(model_data)
+    if layout is None:
+        return model_data
+
+    raise ValueError(
+        "Layout " + str(layout) + " not supported. "
+        "Layouts supported: " + str(LAYOUTS)
+    )
+
+
+def get_partition_keys(dataset_dir: str) -> list:
+    """Returns the partition keys of a hive partitioned dataset
+    (dataset_dir/key_1=value/key_2=value/...).
+
+    Args:
+        dataset_dir (str): Directory of the dataset.
+
+    Returns:
+        list: Partition keys, empty if not partitioned.
+    """
+    keys = []
+    path = dataset_dir
+    while True:
+        subdirs = sorted(d for d in glob(join(path, "*=*")) if isdir(d))
+        if not subdirs:
+            return keys
+        keys.append(basename(subdirs[0]).split("=")[0])
+        path = subdirs[0]
 
 
-def get_model_lt_data(parquet_file, lead_time, start_date, end_date):
-    model_data = duckdb.query(
-        "SELECT * FROM '"
+def _parquet_source(parquet_file: str) -> tuple:
+    # FROM clause and partition keys of a parquet file or glob. A directory
+    # (or a directory glob 'dir/*.parquet') with hive partitions is read as a
+    # partitioned dataset, so DuckDB only opens the partitions that match the
+    # query filters
+    dataset_dir = parquet_file
+    if dataset_dir.endswith("*.parquet"):
+        dataset_dir = dataset_dir[: -len("*.parquet")]
+
+    if dataset_dir and isdir(dataset_dir):
+        keys = get_partition_keys(dataset_dir)
+        if keys:
+            return (
+                "read_parquet('"
+                + join(dataset_dir, "**", "*.parquet")
+                + "', hive_partitioning = true)",
+                keys,
+            )
+
+    return "'" + parquet_file + "'", []
+
+
+def _period_filter(keys: list, start_date, end_date) -> str:
+    # Condition on the year and month partitions of a period
+    if "year" not in keys:
+        return ""
+
+    start_date = pd.Timestamp(start_date)
+    end_date = pd.Timestamp(end_date)
+    if "month" not in keys:
+        return (
+            " AND year BETWEEN " + str(start_date.year) + " AND " + str(end_date.year)
+        )
+
+    return (
+        " AND year * 100 + month BETWEEN "
+        + str(start_date.year * 100 + start_date.month)
+        + " AND "
+        + str(end_date.year * 100 + end_date.month)
+    )
+
+
+def _drop_partitions(data: DataFrame, keys: list) -> DataFrame:
+    return data.drop(columns=[key for key in keys if key in DERIVED_PARTITIONS])
+
+
+def write_hive_partitions(
+    parquet_file: str,
+    dataset_dir: str,
+    time_column: str,
+    sort_by: list,
+    partition_by: list = None,
+    keys: list = None,
+):
+    """Writes a parquet file to a hive partitioned dataset by year and month
+    of time_column, and optionally by other columns
+    (dataset_dir/year=Y/month=M/...). Rows are sorted by sort_by. Months of
+    the file already in the dataset are merged: their rows are kept unless
+    the file has a row with the same keys, which replaces them. Partitions
+    are written to a staging directory first and each month is moved into
+    place at once.
+
+    Args:
+        parquet_file (str): Path or glob of the parquet files to write.
+        dataset_dir (str): Directory of the dataset.
+        time_column (str): Column of the datetime of each row.
+        sort_by (list): Columns to sort the rows of each partition.
+        partition_by (list, optional): Partition keys after year and month.
+                                       Defaults to None.
+        keys (list, optional): Columns identifying a row. Defaults to None
+                               (sort_by, partition_by and 'variable' if the
+                               file has it).
+    """
+    partition_by = DERIVED_PARTITIONS + list(partition_by or [])
+    staging_dir = dataset_dir.rstrip("/") + "_staging"
+    if exists(staging_dir):
+        rmtree(staging_dir)
+
+    if keys is None:
+        columns = duckdb.sql("SELECT * FROM '" + parquet_file + "' LIMIT 0").columns
+        keys = list(sort_by) + partition_by[len(DERIVED_PARTITIONS) :]
+        if "variable" in columns:
+            keys.append("variable")
+        keys = list(dict.fromkeys(keys))
+
+    source = (
+        "SELECT *, YEAR("
+        + time_column
+        + ") AS year, MONTH("
+        + time_column
+        + ") AS month FROM '"
         + parquet_file
-        + "' WHERE LEAD_TIME = "
-        + str(lead_time)
-        + " AND RUN_DATETIME >= '"
-        + start_date
-        + "' AND RUN_DATETIME <= '"
-        + end_date
         + "'"
-    ).df()
+    )
+
+    # Rows already in the months of the file, except those the file replaces
+    months = duckdb.sql(
+        "SELECT DISTINCT YEAR("
+        + time_column
+        + "), MONTH("
+        + time_column
+        + ") FROM '"
+        + parquet_file
+        + "'"
+    ).fetchall()
+    existing_files = [
+        existing_file
+        for year, month in months
+        for existing_file in glob(
+            join(
+                dataset_dir,
+                "year=" + str(year),
+                "month=" + str(month),
+                "**",
+                "*.parquet",
+            ),
+            recursive=True,
+        )
+    ]
+    if existing_files:
+        source += (
+            " UNION ALL BY NAME SELECT o.* FROM read_parquet(["
+            + ", ".join("'" + existing_file + "'" for existing_file in existing_files)
+            + "], hive_partitioning = true) o ANTI JOIN '"
+            + parquet_file
+            + "' n USING ("
+            + ", ".join(keys)
+            + ")"
+        )
+
+    duckdb.sql(
+        "COPY (SELECT * FROM ("
+        + source
+        + ") ORDER BY "
+        + ", ".join(sort_by)
+        + ") TO '"
+        + staging_dir
+        + "' (FORMAT PARQUET, PARTITION_BY ("
+        + ", ".join(partition_by)
+        + "))"
+    )
+
+    for month_dir in glob(join(staging_dir, "year=*", "month=*")):
+        target_dir = join(dataset_dir, relpath(month_dir, staging_dir))
+        old_dir = join(staging_dir + "_old", relpath(month_dir, staging_dir))
+        makedirs(dirname(target_dir), exist_ok=True)
+        if exists(target_dir):
+            makedirs(dirname(old_dir), exist_ok=True)
+            replace(target_dir, old_dir)
+        replace(month_dir, target_dir)
+
+    rmtree(staging_dir)
+    if exists(staging_dir + "_old"):
+        rmtree(staging_dir + "_old")
+
+
+def get_parquet_columns(parquet_file: str, reader=None) -> list:
+    """Returns the column names of a parquet file, glob or hive partitioned
+    dataset.
+
+    Args:
+        parquet_file (str): Path or glob of parquet files.
+        reader (ParquetReader, optional): Reader to run the query. Defaults
+                                          to None (default reader).
+
+    Returns:
+        list: Column names.
+    """
+    source, keys = _parquet_source(parquet_file)
+    columns = (
+        _get_reader(reader).execute("SELECT * FROM " + source + " LIMIT 0").column_names
+    )
+
+    return [column for column in columns if column not in DERIVED_PARTITIONS]
+
+
+def write_model_data(
+    model_data: DataFrame,
+    parquet_file: str,
+    layout: str = "long",
+    row_group_size: int = 4096,
+):
+    """Writes NWP model data to a parquet file. In wide layout, variables are
+    stored as float32 and rows are sorted by (lead_time, station_id,
+    run_datetime), so row groups can be skipped when reading by lead time or
+    station.
+
+    Args:
+        model_data (pd.DataFrame): NWP model data in any layout.
+        parquet_file (str): Path of the parquet file.
+        layout (str, optional): 'long' or 'wide'. Defaults to 'long'.
+        row_group_size (int, optional): Rows of each row group in wide layout.
+                                        Defaults to 4096.
+
+    Raises:
+        ValueError: If layout is not supported.
+    """
+    if layout == "long":
+        to_long_layout(model_data).to_parquet(parquet_file)
+    elif layout == "wide":
+        wide_data = to_wide_layout(model_data)
+        wide_data = wide_data.astype(
+            {var: np.float32 for var in get_model_variables(wide_data)}
+        ).sort_values(["lead_time", "station_id", "run_datetime"])
+        wide_data.to_parquet(parquet_file, index=False, row_group_size=row_group_size)
+    else:
+        raise ValueError(
+            "Layout " + str(layout) + " not supported. "
+            "Layouts supported: ['long', 'wide']"
+        )
+
+
+class ModelParquetWriter:
+    """Class to write NWP model runs to a parquet file as they are extracted,
+    by default with one row group per run. Only the run being written is kept
+    in memory. Data is written to a temporary file, renamed to the final path
+    on close, so a partially written file never matches '*.parquet'.
+
+    Rows of each run are sorted by (lead_time, station_id). A row group per
+    run spans all lead times, so its statistics cannot skip row groups when
+    reading by lead time (as write_model_data does). A smaller row_group_size
+    splits each run in row groups of consecutive lead times and restores that
+    pruning, at the cost of more row groups.
+    """
+
+    def __init__(
+        self,
+        parquet_file: str,
+        layout: str = "long",
+        variables: list = None,
+        row_group_size: int = None,
+    ):
+        """Inits ModelParquetWriter class. The file is created with the first
+        run written.
+
+        Args:
+            parquet_file (str): Final path of the parquet file.
+            layout (str, optional): 'long' or 'wide'. Defaults to 'long'.
+            variables (list, optional): All the variables of the file, to set
+                                        the wide layout columns. Defaults to
+                                        None (variables of the first run).
+            row_group_size (int, optional): Maximum rows of each row group.
+                                            Defaults to None (one row group
+                                            per run).
+
+        Raises:
+            ValueError: If layout is not supported.
+        """
+        if layout not in ["long", "wide"]:
+            raise ValueError(
+                "Layout " + str(layout) + " not supported. "
+                "Layouts supported: ['long', 'wide']"
+            )
+
+        self.parquet_file = parquet_file
+        self.layout = layout
+        self.variables = None if variables is None else sorted(variables)
+        self.row_group_size = row_group_size
+        self.tmp_file = parquet_file + "." + str(getpid()) + ".tmp"
+        self.n_runs = 0
+        self._writer = None
+
+    def __enter__(self):
+        return self
 
-    model_data.dropna(inplace=True)
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_run(self, run_data: pa.Table):
+        """Writes the data of one run, sorted by (lead_time, station_id). In
+        wide layout, variables are stored as float32 and variables missing in
+        the run are written as nulls.
+
+        Args:
+            run_data (pa.Table): NWP model data of one run in long layout.
+
+        Raises:
+            ValueError: If the run has variables not in the wide layout
+                        columns of the file.
+        """
+        if self.layout == "long":
+            table = run_data.sort_by(
+                [("lead_time", "ascending"), ("station_id", "ascending")]
+            )
+        else:
+            wide_data = to_wide_layout(run_data.to_pandas())
+            run_variables = get_model_variables(wide_data)
+            if self.variables is None:
+                self.variables = run_variables
+
+            unknown = sorted(set(run_variables) - set(self.variables))
+            if unknown:
+                raise ValueError(
+                    "Variables "
+                    + str(unknown)
+                    + " not in the columns of "
+                    + self.parquet_file
+                    + ": "
+                    + str(self.variables)
+                    + ". All variables must be passed to ModelParquetWriter."
+                )
+
+            wide_data = (
+                wide_data.reindex(columns=MODEL_KEYS + ["datetime"] + self.variables)
+                .astype({var: np.float32 for var in self.variables})
+                .sort_values(["lead_time", "station_id"])
+            )
+            table = pa.Table.from_pandas(wide_data, preserve_index=False)
+
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp_file, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+
+        row_group_size = self.row_group_size or max(table.num_rows, 1)
+        self._writer.write_table(table, row_group_size=row_group_size)
+        self.n_runs += 1
+
+    def close(self):
+        """Closes the file and moves it to its final path. Nothing is written
+        if no run was written.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            replace(self.tmp_file, self.parquet_file)
+
+    def abort(self):
+        """Closes and removes the temporary file, leaving the final path
+        untouched.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if exists(self.tmp_file):
+            remove(self.tmp_file)
+
+
+class ParquetReader:
+    """Class to query parquet files, globs or hive partitioned datasets
+    through one configured DuckDB connection, with parameterized filters and
+    column projection. Results are returned as Arrow tables or NumPy arrays,
+    without conversion to pandas.
+    """
+
+    OUTPUTS = ["arrow", "numpy", "pandas"]
+
+    def __init__(
+        self, threads: int = None, memory_limit: str = None, object_cache: bool = True
+    ):
+        """Inits ParquetReader class with an in-memory DuckDB database.
+
+        Args:
+            threads (int, optional): Number of DuckDB threads. Defaults to
+                                     None (number of CPUs).
+            memory_limit (str, optional): DuckDB memory limit, e.g. '4GB'.
+                                          Defaults to None (DuckDB default).
+            object_cache (bool, optional): Keep parquet metadata between
+                                           queries. Defaults to True.
+        """
+        config = {"enable_object_cache": object_cache}
+        if threads is not None:
+            config["threads"] = threads
+        if memory_limit is not None:
+            config["memory_limit"] = memory_limit
+
+        self.connection = duckdb.connect(config=config)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the DuckDB connection."""
+        self.connection.close()
+
+    def execute(self, query: str, parameters: list = None, output: str = "arrow"):
+        """Runs a parameterized query on its own cursor of the connection, so
+        a reader can be shared between threads.
+
+        Args:
+            query (str): SQL query with '?' placeholders.
+            parameters (list, optional): Values bound to the placeholders.
+                                         Defaults to None.
+            output (str, optional): 'arrow' (pa.Table), 'numpy' (dict of
+                                    np.ndarray) or 'pandas'. Defaults to
+                                    'arrow'.
+
+        Raises:
+            ValueError: If output is not supported.
+
+        Returns:
+            pa.Table, dict or pd.DataFrame: Query result.
+        """
+        if output not in self.OUTPUTS:
+            raise ValueError(
+                "Output " + str(output) + " not supported. "
+                "Outputs supported: " + str(self.OUTPUTS)
+            )
+
+        cursor = self.connection.cursor()
+        try:
+            result = cursor.execute(query, parameters or [])
+            if output == "numpy":
+                return result.fetchnumpy()
+            if output == "pandas":
+                return result.df()
+
+            table = result.arrow()
+            # Newer DuckDB versions return a RecordBatchReader
+            if isinstance(table, pa.RecordBatchReader):
+                table = table.read_all()
+            return table
+        finally:
+            cursor.close()
+
+    def read(
+        self,
+        parquet_file: str,
+        columns: list = None,
+        filters: dict = None,
+        time_column: str = None,
+        start_date=None,
+        end_date=None,
+        partition_column: str = None,
+        drop_nulls: bool = False,
+        order_by: list = None,
+        output: str = "arrow",
+    ):
+        """Reads the rows of parquet files matching the filters.
+
+        Args:
+            parquet_file (str): Path, glob or hive partitioned directory.
+            columns (list, optional): Columns to read. Defaults to None (all
+                                      data columns).
+            filters (dict, optional): Accepted values of columns, e.g.
+                                      {'station_id': [...], 'lead_time': [0]}.
+                                      Defaults to None.
+            time_column (str, optional): Column of the start_date and
+                                         end_date filters. Defaults to None.
+            start_date (optional): First datetime (included). Defaults to
+                                   None.
+            end_date (optional): Last datetime (included). Defaults to None.
+            partition_column (str, optional): Column the year and month
+                                              partitions were derived from.
+                                              Partitions are only pruned by
+                                              the dates if it is time_column.
+                                              Defaults to None.
+            drop_nulls (bool, optional): Skip rows with a NULL in any column.
+                                         Defaults to False.
+            order_by (list, optional): Columns to sort the rows. Defaults to
+                                       None.
+            output (str, optional): 'arrow' (pa.Table), 'numpy' (dict of
+                                    np.ndarray) or 'pandas'. Defaults to
+                                    'arrow'.
+
+        Raises:
+            ValueError: If output is not supported.
+            ValueError: If a date filter is given without time_column.
+
+        Returns:
+            pa.Table, dict or pd.DataFrame: Rows read.
+        """
+        if time_column is None and (start_date is not None or end_date is not None):
+            raise ValueError("time_column must be supplied to filter by dates.")
+
+        source, keys = _parquet_source(parquet_file)
+
+        if columns is None:
+            projection = "*"
+            derived = [key for key in keys if key in DERIVED_PARTITIONS]
+            if derived:
+                projection = "* EXCLUDE (" + ", ".join(derived) + ")"
+        else:
+            projection = ", ".join('"' + column + '"' for column in columns)
+
+        conditions = []
+        parameters = []
+        if start_date is not None:
+            conditions.append('"' + time_column + '" >= ?')
+            parameters.append(pd.Timestamp(start_date).to_pydatetime())
+        if end_date is not None:
+            conditions.append('"' + time_column + '" <= ?')
+            parameters.append(pd.Timestamp(end_date).to_pydatetime())
+        for column, values in (filters or {}).items():
+            conditions.append('"' + column + '" = ANY(?)')
+            parameters.append([_to_parameter(value) for value in values])
+        if drop_nulls:
+            conditions.append("COLUMNS(*) IS NOT NULL")
+
+        query = "SELECT " + projection + " FROM " + source
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+            # Year and month partitions only prune the period of their own
+            # column, e.g. not valid datetimes of run_datetime partitions
+            if (
+                start_date is not None
+                and end_date is not None
+                and time_column == partition_column
+            ):
+                query += _period_filter(keys, start_date, end_date)
+        if order_by:
+            query += " ORDER BY " + ", ".join('"' + column + '"' for column in order_by)
+
+        return self.execute(query, parameters, output)
+
+
+def _to_parameter(value):
+    # Python value of a query parameter: DuckDB does not bind NumPy scalars
+    # or pandas timestamps inside lists
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.datetime64):
+        return pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+_READERS = {}
+
+
+def _get_reader(reader: ParquetReader = None) -> ParquetReader:
+    # Reader given or default reader of the process. DuckDB connections are
+    # not shared with forked workers
+    if reader is not None:
+        return reader
+    if getpid() not in _READERS:
+        _READERS.clear()
+        _READERS[getpid()] = ParquetReader()
+
+    return _READERS[getpid()]
+
+
+def get_model_lt_data(
+    parquet_file, lead_time, start_date, end_date, layout="long", reader=None
+):
+    model_data = _get_reader(reader).read(
+        parquet_file,
+        filters={"lead_time": [lead_time]},
+        time_column="run_datetime",
+        start_date=start_date,
+        end_date=end_date,
+        partition_column="run_datetime",
+        output="pandas",
+    )
+
+    model_data = _drop_missing(model_data)
 
     if len(model_data) == 0:
         raise ValueError("")
 
-    return model_data
+    return _as_layout(model_data, layout)
 
 
-def get_model_run(parquet_file, run_datetime):
-    model_data = duckdb.query(
-        "SELECT * FROM '"
-        + parquet_file
-        + "*.parquet' WHERE run_datetime = '"
-        + run_datetime.strftime("%Y-%m-%d %H:%M:%S")
-        + "';"
-    ).df()
+def get_model_period_data(
+    parquet_file, start_date, end_date, layout="long", reader=None
+):
+    model_data = _get_reader(reader).read(
+        parquet_file,
+        time_column="run_datetime",
+        start_date=start_date,
+        end_date=end_date,
+        partition_column="run_datetime",
+        order_by=["lead_time", "station_id"],
+        output="pandas",
+    )
 
-    return model_data
+    model_data = _drop_missing(model_data)
 
+    if len(model_data) == 0:
+        raise ValueError("")
 
-def get_station_var_data(parquet_file, variable, start_date, end_date):
+    return _as_layout(model_data, layout)
 
-    station_data = duckdb.query(
-        "SELECT * FROM '"
-        + parquet_file
-        + "' WHERE VARIABLE = '"
-        + variable
-        + "' AND DATETIME >= '"
-        + start_date
-        + "' AND DATETIME <= '"
-        + end_date
-        + "'"
-    ).df()
 
-    station_data.dropna(inplace=True)
+def get_model_run(parquet_file, run_datetime, layout="long", reader=None):
+    model_data = _get_reader(reader).read(
+        parquet_file + "*.parquet",
+        time_column="run_datetime",
+        start_date=run_datetime,
+        end_date=run_datetime,
+        partition_column="run_datetime",
+        output="pandas",
+    )
+
+    return _as_layout(model_data, layout)
+
+
+def get_model_runs(parquet_file, start_date, end_date, layout="long", reader=None):
+    model_data = _get_reader(reader).read(
+        parquet_file + "*.parquet",
+        time_column="run_datetime",
+        start_date=start_date,
+        end_date=end_date,
+        partition_column="run_datetime",
+        order_by=["run_datetime"],
+        output="pandas",
+    )
+
+    return _as_layout(model_data, layout)
+
+
+def get_station_var_data(parquet_file, variable, start_date, end_date, reader=None):
+
+    station_data = _get_reader(reader).read(
+        parquet_file,
+        filters={"variable": [variable]},
+        time_column="datetime",
+        start_date=start_date,
+        end_date=end_date,
+        partition_column="datetime",
+        drop_nulls=True,
+        output="pandas",
+    )
 
     if len(station_data) == 0:
         raise ValueError("")
 
     return station_data
+
+
+def get_valid_station_tokens(parquet_file, variable, min_count, reader=None):
+    station_tokens = _get_reader(reader).execute(
+        "SELECT station_id, CAST(ROW_NUMBER() OVER (ORDER BY station_id) - 1 AS "
+        "INTEGER) AS station_token_id FROM "
+        + _parquet_source(parquet_file)[0]
+        + " WHERE variable = ? AND value IS NOT NULL GROUP BY station_id"
+        " HAVING COUNT(*) > ? ORDER BY station_id",
+        [variable, int(min_count)],
+        output="pandas",
+    )
+
+    return station_tokens
+
+
+def get_training_matrix(
+    model_parquet: str,
+    station_parquet: str,
+    predictand: str,
+    start_date: str,
+    end_date: str,
+    lead_time: int = None,
+    predictors: list = None,
+    min_samples: int = 850,
+    stations: list = None,
+    reader: ParquetReader = None,
+) -> tuple:
+    """Builds the training data of every station and lead time in one DuckDB
+    query: model data is pivoted to a column per predictor, joined with the
+    observations of the predictand at its valid time and the (station_id,
+    lead_time) groups with less than min_samples complete rows are dropped.
+    Rows with a missing predictor or observation are not part of the
+    training data.
+
+    Args:
+        model_parquet (str): Path, glob or hive directory of model data, in
+                             long or wide layout.
+        station_parquet (str): Path, glob or hive directory of observations.
+        predictand (str): Observed variable.
+        start_date (str): Start of the training period ('%Y-%m-%d %H:%M:%S').
+        end_date (str): End of the training period ('%Y-%m-%d %H:%M:%S').
+        lead_time (int, optional): Lead time. Defaults to None (all lead
+                                   times).
+        predictors (list, optional): Model variables. Defaults to None (all
+                                     model variables).
+        min_samples (int, optional): Minimum rows of a group to be kept.
+                                     Defaults to 850.
+        stations (list, optional): Station identification codes. Defaults to
+                                   None (all stations).
+        reader (ParquetReader, optional): Reader to run the queries. Defaults
+                                          to None (default reader).
+
+    Returns:
+        tuple: Training data with 'station_id', 'lead_time', 'run_datetime',
+               'datetime', a column for each predictor and 'obs', sorted by
+               (station_id, lead_time, datetime); the row slice of each
+               (station_id, lead_time) group and the predictors.
+    """
+    reader = _get_reader(reader)
+    model_source, model_keys = _parquet_source(model_parquet)
+    station_source, station_keys = _parquet_source(station_parquet)
+    columns = get_parquet_columns(model_parquet, reader)
+    wide = "variable" not in columns
+
+    period = [
+        pd.Timestamp(start_date).to_pydatetime(),
+        pd.Timestamp(end_date).to_pydatetime(),
+    ]
+    model_filter = " WHERE run_datetime >= ? AND run_datetime <= ?" + _period_filter(
+        model_keys, start_date, end_date
+    )
+    model_parameters = list(period)
+    if lead_time is not None:
+        model_filter += " AND lead_time = ?"
+        model_parameters.append(int(lead_time))
+    if stations is not None:
+        model_filter += " AND station_id = ANY(?)"
+        model_parameters.append(list(stations))
+
+    if predictors is None:
+        if wide:
+            predictors = [
+                column for column in columns if column not in MODEL_KEYS + ["datetime"]
+            ]
+        else:
+            predictors = reader.execute(
+                "SELECT DISTINCT variable FROM " + model_source + model_filter,
+                model_parameters,
+            )["variable"].to_pylist()
+        predictors = sorted(predictors)
+
+    if wide:
+        model_query = (
+            "SELECT station_id, lead_time, run_datetime, "
+            "run_datetime + TO_HOURS(CAST(lead_time AS BIGINT)) AS datetime"
+            + "".join(', "' + var + '"' for var in predictors)
+            + " FROM "
+            + model_source
+            + model_filter
+        )
+    else:
+        model_query = (
+            "SELECT station_id, lead_time, run_datetime, "
+            "run_datetime + TO_HOURS(CAST(lead_time AS BIGINT)) AS datetime"
+            + "".join(
+                ', FIRST(value) FILTER (WHERE variable = ?) AS "' + var + '"'
+                for var in predictors
+            )
+            + " FROM "
+            + model_source
+            + model_filter
+            + " AND variable = ANY(?) GROUP BY station_id, lead_time, run_datetime"
+        )
+        model_parameters = predictors + model_parameters + [predictors]
+
+    station_query = (
+        "SELECT station_id, datetime, value AS obs FROM "
+        + station_source
+        + " WHERE variable = ? AND value IS NOT NULL AND NOT ISNAN(value)"
+        " AND datetime >= ? AND datetime <= ?"
+        + _period_filter(station_keys, start_date, end_date)
+    )
+    station_parameters = [predictand] + period
+    if stations is not None:
+        station_query += " AND station_id = ANY(?)"
+        station_parameters.append(list(stations))
+
+    # Incomplete rows are filtered before the window, so they are not counted
+    # toward min_samples
+    query = (
+        "SELECT m.*, o.obs FROM ("
+        + model_query
+        + ") m JOIN ("
+        + station_query
+        + ") o ON o.station_id = m.station_id AND o.datetime = m.datetime"
+        + "".join(
+            ' AND m."' + var + '" IS NOT NULL AND NOT ISNAN(m."' + var + '")'
+            for var in predictors
+        )
+        + " QUALIFY COUNT(*) OVER (PARTITION BY m.station_id, m.lead_time) >= ?"
+        " ORDER BY m.station_id, m.lead_time, m.datetime"
+    )
+    training_data = reader.execute(
+        query,
+        model_parameters + station_parameters + [int(min_samples)],
+        output="pandas",
+    )
+
+    slices = group_slices([training_data["station_id"], training_data["lead_time"]])
+
+    return training_data, slices, predictors
+
+
+def write_features(
+    model_file,
+    station_parquet,
+    station_tokens_file,
+    variable,
+    features,
+    features_file,
+    start_date,
+    end_date,
+    row_group_size=65536,
+    reader=None,
+):
+    reader = _get_reader(reader)
+    if "variable" in get_parquet_columns(model_file, reader):
+        pivot_columns = "".join(
+            ', FIRST(m.value) FILTER (WHERE m.variable = ?) AS "' + var + '"'
+            for var in features
+        )
+        parameters = list(features)
+    else:
+        # Wide layout, already a column per variable
+        pivot_columns = "".join(
+            ', FIRST(m."' + var + '") AS "' + var + '"' for var in features
+        )
+        parameters = []
+    parameters += [
+        variable,
+        pd.Timestamp(start_date).to_pydatetime(),
+        pd.Timestamp(end_date).to_pydatetime(),
+    ]
+    reader.execute(
+        "COPY (SELECT * FROM (SELECT m.station_id, t.station_token_id, "
+        "m.run_datetime, m.lead_time, "
+        "m.run_datetime + TO_HOURS(CAST(m.lead_time AS BIGINT)) AS datetime"
+        + pivot_columns
+        + ", FIRST(o.value) AS obs FROM "
+        + _parquet_source(model_file)[0]
+        + " m JOIN '"
+        + station_tokens_file
+        + "' t ON m.station_id = t.station_id JOIN (SELECT * FROM "
+        + _parquet_source(station_parquet)[0]
+        + " WHERE variable = ? AND value IS NOT NULL) o"
+        " ON o.station_id = m.station_id AND "
+        "o.datetime = m.run_datetime + TO_HOURS(CAST(m.lead_time AS BIGINT)) "
+        "WHERE m.run_datetime + TO_HOURS(CAST(m.lead_time AS BIGINT)) >= ?"
+        " AND m.run_datetime + TO_HOURS(CAST(m.lead_time AS BIGINT)) < ?"
+        " GROUP BY ALL) WHERE COLUMNS(*) IS NOT NULL "
+        "ORDER BY run_datetime, station_id, lead_time) TO '"
+        + features_file
+        + "' (FORMAT PARQUET, ROW_GROUP_SIZE "
+        + str(int(row_group_size))
+        + ")",
+        parameters,
+    )
@@ -0,0 +1,115 @@
+"""Module to provide training data grouped by lead time and station.
+"""
+import pandas as pd
+from pandas import DataFrame
+
+from postproc.io.parquet import (
+    ParquetReader,
+    get_model_period_data,
+    get_station_var_data,
+)
+from postproc.utils.arrays import group_slices
+
+
+class TrainingDataProvider:
+    """Class to load NWP model and observational data once and hand out
+    slices for each lead time and station."""
+
+    def __init__(
+        self,
+        model_parquet: str,
+        station_parquet: str,
+        variables: list,
+        start_date: str,
+        end_date: str,
+    ):
+        """Inits TrainingDataProvider class reading all lead times of model
+        data and all observations of the training period. Data is sorted by
+        (lead_time, station_id) and (variable, station_id) respectively, and
+        the row slice of each group is precomputed.
+
+        Args:
+            model_parquet (str): Path or glob of model parquet files.
+            station_parquet (str): Path or glob of station parquet files.
+            variables (list): Observed variables to load.
+            start_date (str): Start of the training period
+                              ('%Y-%m-%d %H:%M:%S').
+            end_date (str): End of the training period ('%Y-%m-%d %H:%M:%S').
+
+        Raises:
+            ValueError: If no model or station data found for the period.
+        """
+        # Model data is already sorted by (lead_time, station_id) in the query
+        # and kept in its storage layout. All queries share one connection
+        with ParquetReader() as reader:
+            self.model_data = get_model_period_data(
+                model_parquet, start_date, end_date, layout=None, reader=reader
+            ).reset_index(drop=True)
+
+            station_data = pd.concat(
+                [
+                    get_station_var_data(
+                        station_parquet, var, start_date, end_date, reader=reader
+                    )
+                    for var in variables
+                ]
+            )
+
+        self.station_data = station_data.sort_values(
+            ["variable", "station_id"], kind="stable"
+        ).reset_index(drop=True)
+
+        self._model_slices = group_slices(
+            [self.model_data["lead_time"], self.model_data["station_id"]]
+        )
+        self._lead_time_slices = group_slices([self.model_data["lead_time"]])
+        self._station_slices = group_slices(
+            [self.station_data["variable"], self.station_data["station_id"]]
+        )
+        self._variable_slices = group_slices([self.station_data["variable"]])
+
+        self.lead_times = [lead_time for lead_time, in self._lead_time_slices]
+
+    def get_model_lt_data(self, lead_time: int) -> DataFrame:
+        """Returns model data of a lead time, sorted by station.
+
+        Args:
+            lead_time (int): Lead time.
+
+        Returns:
+            pd.DataFrame: Model data slice (empty if lead time not found).
+        """
+        rows = self._lead_time_slices.get((lead_time,), slice(0, 0))
+
+        return self.model_data.iloc[rows]
+
+    def get_station_var_data(self, variable: str) -> DataFrame:
+        """Returns observational data of a variable, sorted by station.
+
+        Args:
+            variable (str): Observed variable.
+
+        Returns:
+            pd.DataFrame: Observational data slice (empty if variable not
+                          found).
+        """
+        rows = self._variable_slices.get((variable,), slice(0, 0))
+
+        return self.station_data.iloc[rows]
+
+    def get_station_data(self, station_id: str, lead_time: int, variable: str) -> tuple:
+        """Returns model and observational data of a station.
+
+        Args:
+            station_id (str): Station identification code.
+            lead_time (int): Lead time of model data.
+            variable (str): Observed variable.
+
+        Returns:
+            tuple: Model data and observational data slices (empty if not
+                   found).
+        """
+        model_rows = self._model_slices.get((lead_time, station_id), slice(0, 0))
+        station_rows = self._station_slices.get((variable, station_id), slice(0, 0))
+
+        return self.model_data.iloc[model_rows], self.station_data.iloc[station_rows]
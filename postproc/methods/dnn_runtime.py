@@ -0,0 +1,169 @@
+"""Module to run station-embedding DNN models with NumPy only, so forecasts do
+not need TensorFlow.
+"""
+from os.path import exists
+
+import numpy as np
+from pandas import DataFrame
+
+from postproc.io.parquet import to_wide_layout
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "leaky_relu": lambda x: np.where(x > 0, x, np.float32(0.2) * x),
+}
+
+
+def export_dnn_weights(dnn_model, weights_file: str, features: list):
+    """Exports the weights of a create_dnn_architecture model to a .npz file:
+    normalization statistics (if the model normalizes its features),
+    embedding table and dense kernels, biases and activations.
+
+    Args:
+        dnn_model (tf.keras.Model): Trained DNN model.
+        weights_file (str): Path of the .npz file.
+        features (list): Names of the input features, in order.
+
+    Raises:
+        ValueError: If a layer activation is not supported.
+    """
+    weights = {"features": np.array(features)}
+    activations = []
+    n_dense = 0
+
+    for layer in dnn_model.layers:
+        layer_type = type(layer).__name__
+        if layer_type == "Normalization":
+            weights["norm_mean"] = np.asarray(layer.mean, dtype=np.float32)
+            weights["norm_variance"] = np.asarray(layer.variance, dtype=np.float32)
+        elif layer_type == "Embedding":
+            weights["embedding"] = np.asarray(layer.embeddings, dtype=np.float32)
+        elif layer_type == "Dense":
+            activation = layer.get_config()["activation"]
+            if activation not in ACTIVATIONS:
+                raise ValueError(
+                    "Activation " + str(activation) + " not supported. "
+                    "Activations supported: " + str(list(ACTIVATIONS))
+                )
+            weights["kernel_" + str(n_dense)] = np.asarray(
+                layer.kernel, dtype=np.float32
+            )
+            weights["bias_" + str(n_dense)] = np.asarray(layer.bias, dtype=np.float32)
+            activations.append(activation)
+            n_dense += 1
+
+    weights["activations"] = np.array(activations)
+
+    with open(weights_file, "wb") as f:
+        np.savez(f, **weights)
+
+
+class DnnRuntime:
+    """Class to obtain DNN forecasts with NumPy from exported weights."""
+
+    def __init__(self, weights_file: str):
+        """Inits DnnRuntime class with an exported weights file.
+
+        Args:
+            weights_file (str): Path to a .npz file from export_dnn_weights.
+
+        Raises:
+            FileNotFoundError: If 'weights_file' is not found.
+        """
+        if not exists(weights_file):
+            raise FileNotFoundError(weights_file + " not found.")
+
+        with np.load(weights_file) as weights:
+            self.features = [str(feature) for feature in weights["features"]]
+            self.embedding = weights["embedding"]
+            self.layers = [
+                (
+                    weights["kernel_" + str(i)],
+                    weights["bias_" + str(i)],
+                    ACTIVATIONS[str(activation)],
+                )
+                for i, activation in enumerate(weights["activations"])
+            ]
+            self.norm = None
+            if "norm_mean" in weights:
+                # Same as Keras Normalization layer
+                self.norm = (
+                    weights["norm_mean"],
+                    np.maximum(np.sqrt(weights["norm_variance"]), np.float32(1e-7)),
+                )
+
+    def predict(self, features: np.ndarray, station_tokens: np.ndarray) -> np.ndarray:
+        """Calculates the DNN output for a batch of samples.
+
+        Args:
+            features (np.ndarray): Input features (samples, features), in the
+                                   order of the 'features' attribute.
+            station_tokens (np.ndarray): Station token of each sample.
+
+        Returns:
+            np.ndarray: DNN output of each sample.
+        """
+        x_values = np.asarray(features, dtype=np.float32)
+        if self.norm is not None:
+            x_values = (x_values - self.norm[0]) / self.norm[1]
+
+        station_tokens = np.asarray(station_tokens, dtype=np.int64).reshape(-1)
+        x_values = np.concatenate((x_values, self.embedding[station_tokens]), axis=1)
+
+        for kernel, bias, activation in self.layers:
+            x_values = activation(x_values @ kernel + bias)
+
+        return x_values[:, 0]
+
+
+def forecast_hourly(
+    model_data: DataFrame,
+    stations_id: list,
+    runtime: DnnRuntime,
+    station_tokens: DataFrame,
+) -> DataFrame:
+    """Obtains hourly forecasts for each station in stations_id and each lead
+    time and run of model_data, in one batched forward pass. Stations without
+    token or with missing NWP data get np.nan as forecast.
+
+    Args:
+        model_data (DataFrame): Data from a NWP model for specific points and
+                                one or more runs.
+        stations_id (list): Station id points to obtain a forecast.
+        runtime (DnnRuntime): DNN model.
+        station_tokens (DataFrame): Token of each station ('station_id' and
+                                    'station_token_id').
+
+    Returns:
+        DataFrame: Hourly forecast for each station, with columns
+                   'run_datetime', 'station_id', 'lead_time' and 'forecast'.
+    """
+    features = (
+        to_wide_layout(model_data.loc[model_data["station_id"].isin(stations_id)])
+        .sort_values(["run_datetime", "station_id", "lead_time"])
+        .reset_index(drop=True)
+    )
+    features["station_token_id"] = features["station_id"].map(
+        station_tokens.set_index("station_id")["station_token_id"]
+    )
+
+    x_values = features.reindex(columns=runtime.features).to_numpy(dtype=np.float32)
+    valid = (
+        ~np.isnan(x_values).any(axis=1)
+        & features["station_token_id"].notna().to_numpy()
+    )
+
+    forecast = np.full(len(features), np.nan)
+    forecast[valid] = runtime.predict(
+        x_values[valid], features["station_token_id"].to_numpy()[valid]
+    )
+
+    return DataFrame(
+        {
+            "run_datetime": features["run_datetime"],
+            "station_id": features["station_id"],
+            "lead_time": features["lead_time"],
+            "forecast": forecast,
+        }
+    )
@@ -1,7 +1,10 @@
 """Module to calculate multiple linear regressions.
 """
 
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 from os.path import exists
+from typing import NamedTuple
 
 import duckdb
 import numpy as np
@@ -11,9 +14,142 @@ from sklearn import linear_model
 from sklearn.feature_selection import SequentialFeatureSelector
 from sklearn.linear_model import LinearRegression
 
+from postproc.io.parquet import (
+    get_model_variables,
+    is_wide_layout,
+    to_long_layout,
+    to_wide_layout,
+)
 
-def get_station_predictors(
+
+def forward_stepwise_selection(
+    x_values: np.ndarray, y_values: np.ndarray, tol: float = 0.02, n_folds: int = 5
+) -> np.ndarray:
+    """Selects predictors by forward stepwise selection with the same
+    semantics as SequentialFeatureSelector(LinearRegression(), scoring="r2",
+    direction="forward", n_features_to_select="auto"): at each step the
+    predictor maximizing the mean R² of a non-shuffled k-fold cross
+    validation is added, until the improvement is lower than tol. Folds are
+    evaluated in closed form from their Gram matrices (XᵀX, Xᵀy), so no
+    regression is refitted on the data.
+
+    Args:
+        x_values (np.ndarray): Predictor values (samples, predictors).
+        y_values (np.ndarray): Predictand values (samples).
+        tol (float, optional): Minimum R² improvement to add a predictor.
+                               Defaults to 0.02.
+        n_folds (int, optional): Number of cross validation folds. Defaults
+                                 to 5.
+
+    Returns:
+        np.ndarray: Boolean mask of the selected predictors.
+    """
+    n_samples, n_features = x_values.shape
+
+    # Standardizing does not change the regressions and keeps the Gram
+    # matrices well conditioned
+    std = x_values.std(axis=0)
+    std[std == 0] = 1
+    x_y = np.column_stack(
+        ((x_values - x_values.mean(axis=0)) / std, y_values - y_values.mean())
+    )
+
+    fold_counts = np.full(n_folds, n_samples // n_folds)
+    fold_counts[: n_samples % n_folds] += 1
+    bounds = np.concatenate(([0], np.cumsum(fold_counts)))
+
+    sums = np.array([x_y[i_0:i_1].sum(axis=0) for i_0, i_1 in zip(bounds, bounds[1:])])
+    grams = np.array(
+        [x_y[i_0:i_1].T @ x_y[i_0:i_1] for i_0, i_1 in zip(bounds, bounds[1:])]
+    )
+
+    # Training statistics of each fold are the totals minus the test fold
+    train_counts = n_samples - fold_counts
+    train_mean = (sums.sum(axis=0) - sums) / train_counts[:, None]
+    train_gram = grams.sum(axis=0) - grams
+    train_gram -= train_counts[:, None, None] * (
+        train_mean[:, :, None] * train_mean[:, None, :]
+    )
+    # Test Gram matrices centered on the training means (intercept)
+    test_gram = (
+        grams
+        - sums[:, :, None] * train_mean[:, None, :]
+        - train_mean[:, :, None] * sums[:, None, :]
+        + fold_counts[:, None, None] * (train_mean[:, :, None] * train_mean[:, None, :])
+    )
+    test_sst = grams[:, -1, -1] - sums[:, -1] ** 2 / fold_counts
+
+    support = np.zeros(n_features, dtype=bool)
+    old_score = -np.inf
+    for _ in range(n_features - 1):
+        candidates = np.flatnonzero(~support)
+        subsets = np.column_stack(
+            (np.tile(np.flatnonzero(support), (len(candidates), 1)), candidates)
+        )
+        rows, cols = subsets[:, :, None], subsets[:, None, :]
+
+        # Pseudo-inverse instead of solve, so constant or collinear
+        # predictors get the minimum norm solution as in LinearRegression
+        coefs = (
+            np.linalg.pinv(train_gram[:, rows, cols], hermitian=True)
+            @ train_gram[:, subsets, -1][..., None]
+        )[..., 0]
+        test_ssr = (
+            test_gram[:, None, -1, -1]
+            - 2 * np.einsum("fck,fck->fc", coefs, test_gram[:, subsets, -1])
+            + np.einsum("fck,fckl,fcl->fc", coefs, test_gram[:, rows, cols], coefs)
+        )
+        scores = np.mean(1 - test_ssr / test_sst[:, None], axis=0)
+
+        best = np.argmax(scores)
+        if scores[best] - old_score < tol:
+            break
+        old_score = scores[best]
+        support[candidates[best]] = True
+
+    return support
+
+
+def _get_station_training_data(
     station_data: DataFrame, model_data: DataFrame, predictand: str, predictors: list
+) -> tuple:
+    """Joins pivoted NWP model data with the observations of the predictand.
+
+    Args:
+        station_data (pd.DataFrame): Historical observational data for a
+                                     specific location.
+        model_data (pd.DataFrame): Historical NWP model data, in long or wide
+                                   layout.
+        predictand (str): Predictand variable of the regression.
+        predictors (list): Predictor variables of the regression. If None,
+                           all model variables are used.
+
+    Returns:
+        tuple: Training data with a column for each predictor and 'obs', and
+               the predictors.
+    """
+    station_data = station_data.assign(
+        obs=station_data[station_data["variable"] == predictand]["value"]
+    )
+
+    model_data = to_wide_layout(model_data).sort_values("datetime")
+
+    if predictors is None:
+        predictors = get_model_variables(model_data)
+
+    data = model_data[["datetime"] + list(predictors)].merge(
+        station_data[["datetime", "obs"]], on=["datetime"]
+    )
+
+    return data, predictors
+
+
+def get_station_predictors(
+    station_data: DataFrame,
+    model_data: DataFrame,
+    predictand: str,
+    predictors: list,
+    selector: str = "gram",
 ) -> dict:
     """Calculates multiple linear regression parameters for a specific
     location using NWP model data.
@@ -24,44 +160,74 @@ def get_station_predictors(
         model_data (pd.DataFrame): Historical NWP model data.
         predictand (str): Predictand variable of the regression.
         predictors (list): Predictor variables of the regression.
+        selector (str, optional): Predictor selection mode, 'gram' for
+                                  forward_stepwise_selection or 'sklearn'
+                                  for SequentialFeatureSelector. Defaults to
+                                  'gram'.
+
+    Raises:
+        ValueError: If 'selector' is not 'gram' or 'sklearn'.
 
     Returns:
         dict: Multiple linear regression parameters (score, coefficients,
               intercept and predictors used).
     """
-    min_predictand_improvement = 0.02
+    if selector not in ("gram", "sklearn"):
+        raise ValueError(
+            "Selector " + str(selector) + " not available. Selectors "
+            "available: ['gram', 'sklearn']"
+        )
 
-    station_data = station_data.assign(
-        obs=station_data[station_data["variable"] == predictand]["value"]
+    data, predictors = _get_station_training_data(
+        station_data, model_data, predictand, predictors
     )
 
-    model_data = model_data.drop_duplicates()
-    model_data = model_data.pivot(
-        index=["datetime"], columns=["variable"], values="value"
-    ).reset_index()
-
-    if predictors is None:
-        predictors = model_data.columns[1:]
-
-    data = model_data.merge(station_data[["datetime", "obs"]], on=["datetime"])
-
     if len(data) < 850:
         return None
 
     y_values = np.array(data["obs"])
     x_values = np.array(data[predictors])
 
-    sfs_forward = SequentialFeatureSelector(
-        LinearRegression(),
-        n_features_to_select="auto",
-        tol=min_predictand_improvement,
-        scoring="r2",
-        direction="forward",
-    ).fit(x_values, y_values)
+    return _fit_regression(x_values, y_values, predictors, selector)
 
-    predictors_used = np.array(predictors)[sfs_forward.get_support()]
 
-    x_transformed = sfs_forward.transform(x_values)
+def _fit_regression(
+    x_values: np.ndarray, y_values: np.ndarray, predictors: list, selector: str
+) -> dict:
+    """Selects the predictors and fits the multiple linear regression.
+
+    Args:
+        x_values (np.ndarray): Predictor values (samples, predictors).
+        y_values (np.ndarray): Observed values of the predictand.
+        predictors (list): Predictor variables, in the order of x_values.
+        selector (str): Predictor selection mode, 'gram' or 'sklearn'.
+
+    Returns:
+        dict: Multiple linear regression parameters (score, coefficients,
+              intercept and predictors used).
+    """
+    min_predictand_improvement = 0.02
+
+    if selector == "gram":
+        support = forward_stepwise_selection(
+            x_values, y_values, tol=min_predictand_improvement
+        )
+    else:
+        support = (
+            SequentialFeatureSelector(
+                LinearRegression(),
+                n_features_to_select="auto",
+                tol=min_predictand_improvement,
+                scoring="r2",
+                direction="forward",
+            )
+            .fit(x_values, y_values)
+            .get_support()
+        )
+
+    predictors_used = np.array(predictors)[support]
+
+    x_transformed = x_values[:, support]
     clf = linear_model.LinearRegression()
 
     clf.fit(x_transformed, y_values)
@@ -74,7 +240,262 @@ def get_station_predictors(
     }
 
 
-def train_regressions(stat, model_data, station_data, lead_time, var):
+def get_station_statistics(
+    station_data: DataFrame, model_data: DataFrame, predictand: str, predictors: list
+) -> dict:
+    """Calculates the sufficient statistics of the multiple linear regressions
+    of a specific location, so regressions can be refitted when new data is
+    added without reading previous data again.
+
+    Args:
+        station_data (pd.DataFrame): Historical observational data for a
+                                     specific location.
+        model_data (pd.DataFrame): Historical NWP model data.
+        predictand (str): Predictand variable of the regression.
+        predictors (list): Candidate predictor variables of the regression.
+
+    Returns:
+        dict: Sufficient statistics (predictors, count, x_sum, y_sum, xtx,
+              xty, yty, start_datetime and end_datetime), or None if there
+              is no data. xtx is flattened.
+    """
+    data, predictors = _get_station_training_data(
+        station_data, model_data, predictand, predictors
+    )
+
+    if len(data) == 0:
+        return None
+
+    return _get_statistics(
+        np.array(data[predictors], dtype=float),
+        np.array(data["obs"], dtype=float),
+        data["datetime"],
+        predictors,
+    )
+
+
+def _get_statistics(
+    x_values: np.ndarray, y_values: np.ndarray, datetimes, predictors: list
+) -> dict:
+    """Calculates the sufficient statistics of a training data set.
+
+    Args:
+        x_values (np.ndarray): Predictor values (samples, predictors).
+        y_values (np.ndarray): Observed values of the predictand.
+        datetimes (pd.Series): Valid datetimes of the samples.
+        predictors (list): Predictor variables, in the order of x_values.
+
+    Returns:
+        dict: Sufficient statistics, see get_station_statistics.
+    """
+    return {
+        "predictors": [str(var) for var in predictors],
+        "count": len(y_values),
+        "x_sum": x_values.sum(axis=0).tolist(),
+        "y_sum": float(y_values.sum()),
+        "xtx": (x_values.T @ x_values).ravel().tolist(),
+        "xty": (x_values.T @ y_values).tolist(),
+        "yty": float(y_values @ y_values),
+        "start_datetime": datetimes.min(),
+        "end_datetime": datetimes.max(),
+    }
+
+
+def merge_statistics(statistics: dict, new_statistics: dict) -> dict:
+    """Adds the sufficient statistics of a newer period.
+
+    Args:
+        statistics (dict): Sufficient statistics.
+        new_statistics (dict): Sufficient statistics of data after
+                               statistics 'end_datetime'.
+
+    Raises:
+        ValueError: If predictors of both statistics are different.
+        ValueError: If new_statistics overlaps statistics period.
+
+    Returns:
+        dict: Sufficient statistics of both periods.
+    """
+    if list(statistics["predictors"]) != list(new_statistics["predictors"]):
+        raise ValueError(
+            "Predictors "
+            + str(list(new_statistics["predictors"]))
+            + " do not match "
+            + str(list(statistics["predictors"]))
+            + "."
+        )
+    if new_statistics["start_datetime"] <= statistics["end_datetime"]:
+        raise ValueError(
+            "New statistics start at "
+            + str(new_statistics["start_datetime"])
+            + ", before the end of previous statistics "
+            + str(statistics["end_datetime"])
+            + "."
+        )
+
+    merged = {"predictors": list(statistics["predictors"])}
+    for key in ["count", "y_sum", "yty"]:
+        merged[key] = statistics[key] + new_statistics[key]
+    for key in ["x_sum", "xtx", "xty"]:
+        merged[key] = (
+            np.asarray(statistics[key]) + np.asarray(new_statistics[key])
+        ).tolist()
+    merged["start_datetime"] = statistics["start_datetime"]
+    merged["end_datetime"] = new_statistics["end_datetime"]
+
+    return merged
+
+
+def fit_statistics(statistics: dict, predictors: list = None) -> dict:
+    """Calculates multiple linear regression parameters from sufficient
+    statistics. If predictors are not provided, they are selected by forward
+    stepwise selection of the in-sample R², with the same tolerance as
+    get_station_predictors (cross validation needs data by folds).
+
+    Args:
+        statistics (dict): Sufficient statistics.
+        predictors (list, optional): Predictor variables of the regression.
+                                     Defaults to None.
+
+    Returns:
+        dict: Multiple linear regression parameters (score, coefficients,
+              intercept and predictors used), or None if there is not
+              enough data.
+    """
+    min_predictand_improvement = 0.02
+
+    count = statistics["count"]
+    if count < 850:
+        return None
+
+    candidates = list(statistics["predictors"])
+    n_features = len(candidates)
+    x_sum = np.asarray(statistics["x_sum"])
+    xtx = np.asarray(statistics["xtx"]).reshape(n_features, n_features)
+    xx_cov = xtx - np.outer(x_sum, x_sum) / count
+    xy_cov = np.asarray(statistics["xty"]) - x_sum * statistics["y_sum"] / count
+    yy_cov = statistics["yty"] - statistics["y_sum"] ** 2 / count
+
+    # Constant predictors (variance at rounding level) are zeroed and the rest
+    # scaled to unit variance, so lstsq gives the minimum norm solution for
+    # constant or collinear predictors, as LinearRegression does
+    constant = np.diag(xx_cov) <= 1e-10 * np.diag(xtx)
+    x_scale = np.sqrt(np.where(constant, 1, np.diag(xx_cov)))
+    xx_corr = xx_cov / np.outer(x_scale, x_scale)
+    xy_corr = xy_cov / x_scale
+    xx_corr[constant] = 0
+    xx_corr[:, constant] = 0
+    xy_corr[constant] = 0
+
+    def fit(support):
+        beta = np.linalg.lstsq(
+            xx_corr[np.ix_(support, support)], xy_corr[support], rcond=1e-10
+        )[0]
+        return beta / x_scale[support], beta @ xy_corr[support] / yy_cov
+
+    if predictors is None:
+        support = []
+        old_score = -np.inf
+        for _ in range(n_features - 1):
+            scores = {
+                i: fit(support + [i])[1] for i in range(n_features) if i not in support
+            }
+            best = max(scores, key=lambda i: scores[i])
+            if scores[best] - old_score < min_predictand_improvement:
+                break
+            old_score = scores[best]
+            support.append(best)
+        support.sort()
+    else:
+        support = [candidates.index(var) for var in predictors]
+
+    coefs, score = fit(support)
+
+    return {
+        "score": float(score),
+        "coefs": coefs.tolist(),
+        "intercept": float((statistics["y_sum"] - x_sum[support] @ coefs) / count),
+        "predictors": np.array(candidates)[support],
+    }
+
+
+def update_regressions(
+    statistics: DataFrame, new_statistics: DataFrame, regressions: DataFrame
+) -> tuple:
+    """Adds sufficient statistics of a new period to the stored ones and
+    refits the regressions. Regressions keep their predictors; entries
+    without a previous regression select them with fit_statistics.
+
+    Args:
+        statistics (pd.DataFrame): Stored sufficient statistics, a row per
+                                   (station_id, lead_time, predictand).
+        new_statistics (pd.DataFrame): Sufficient statistics of the new
+                                       period.
+        regressions (pd.DataFrame): Stored regressions.
+
+    Returns:
+        tuple: Updated sufficient statistics and regressions DataFrames.
+    """
+    keys = ["station_id", "lead_time", "predictand"]
+
+    entries = {
+        tuple(row[key] for key in keys): row for row in statistics.to_dict("records")
+    }
+    for row in new_statistics.to_dict("records"):
+        key = tuple(row[key] for key in keys)
+        if key in entries:
+            merged = merge_statistics(entries[key], row)
+            entries[key] = dict(zip(keys, key), **merged)
+        else:
+            entries[key] = row
+
+    predictors = {
+        (regr.station_id, regr.lead_time, regr.predictand): list(regr.predictors)
+        for regr in regressions.itertuples()
+    }
+
+    updated = []
+    for key, entry in entries.items():
+        params = fit_statistics(entry, predictors.get(key))
+        if params is None:
+            continue
+        updated.append(dict(params, **dict(zip(keys, key))))
+
+    return DataFrame(list(entries.values())), DataFrame(updated)
+
+
+def train_statistics(stat, model_data, station_data, lead_time, var):
+    model_f = model_data[model_data["station_id"] == stat]
+    dt_column = model_f["run_datetime"] + pd.to_timedelta(
+        model_f["lead_time"], unit="hours"
+    )
+    model_f = model_f.assign(datetime=dt_column)
+
+    station_f = station_data[station_data["station_id"] == stat]
+
+    statistics = get_station_statistics(
+        station_f, model_f, predictand=var, predictors=None
+    )
+    if statistics is None:
+        return None
+    statistics["lead_time"] = lead_time
+    statistics["station_id"] = stat
+    statistics["predictand"] = var
+
+    return statistics
+
+
+class RegressionEntry(NamedTuple):
+    """Compact record of a single multiple linear regression."""
+
+    predictors: tuple
+    coefs: np.ndarray
+    intercept: float
+
+
+def train_regressions(
+    stat, model_data, station_data, lead_time, var, selector: str = "gram"
+):
     model_f = model_data[model_data["station_id"] == stat]
     dt_column = model_f["run_datetime"] + pd.to_timedelta(
         model_f["lead_time"], unit="hours"
@@ -84,7 +505,9 @@ def train_regressions(stat, model_data, station_data, lead_time, var):
     station_f = station_data[station_data["station_id"] == stat]
 
     if len(station_f) > 365:
-        params = get_station_predictors(station_f, model_f, predictand=var)
+        params = get_station_predictors(
+            station_f, model_f, predictand=var, predictors=None, selector=selector
+        )
         if params is None:
             return None
         params["lead_time"] = lead_time
@@ -96,6 +519,179 @@ def train_regressions(stat, model_data, station_data, lead_time, var):
     return None
 
 
+def train_matrix_regressions(
+    training_data: DataFrame,
+    slices: dict,
+    predictors: list,
+    predictand: str,
+    selector: str = "gram",
+    min_samples: int = 850,
+    n_workers: int = 1,
+) -> list:
+    """Trains multiple linear regressions for each (station_id, lead_time)
+    group of a training matrix from get_training_matrix. With more than one
+    worker, the matrix is copied once to shared memory and the groups are
+    trained in a pool of processes.
+
+    Args:
+        training_data (pd.DataFrame): Training data with a column for each
+                                      predictor and 'obs'.
+        slices (dict): Row slice of each (station_id, lead_time) group.
+        predictors (list): Predictor variables of the regressions.
+        predictand (str): Predictand variable of the regressions.
+        selector (str, optional): Predictor selection mode, see
+                                  get_station_predictors. Defaults to 'gram'.
+        min_samples (int, optional): Minimum rows of a group to be trained.
+                                     Defaults to 850.
+        n_workers (int, optional): Number of processes. Defaults to 1 (no
+                                   pool), None for the number of CPUs.
+
+    Raises:
+        ValueError: If 'selector' is not 'gram' or 'sklearn'.
+
+    Returns:
+        list: Regression parameters of each group with enough rows, as
+              returned by train_regressions.
+    """
+    if selector not in ("gram", "sklearn"):
+        raise ValueError(
+            "Selector " + str(selector) + " not available. Selectors "
+            "available: ['gram', 'sklearn']"
+        )
+
+    x_values = training_data[list(predictors)].to_numpy(dtype=np.float64)
+    y_values = training_data["obs"].to_numpy(dtype=np.float64)
+
+    groups = [
+        (key, rows)
+        for key, rows in slices.items()
+        if rows.stop - rows.start >= min_samples
+    ]
+
+    if n_workers == 1:
+        fitted = [
+            _fit_regression(x_values[rows], y_values[rows], predictors, selector)
+            for _, rows in groups
+        ]
+    else:
+        blocks, spec = _share_arrays({"x_values": x_values, "y_values": y_values})
+        try:
+            with Pool(
+                processes=n_workers, initializer=_attach_arrays, initargs=(spec,)
+            ) as pool:
+                fitted = pool.map(
+                    _shared_matrix_task,
+                    [(rows, predictors, selector) for _, rows in groups],
+                )
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    regressions = []
+    for ((station_id, lead_time), _), params in zip(groups, fitted):
+        params["lead_time"] = lead_time
+        params["station_id"] = station_id
+        params["predictand"] = predictand
+        regressions.append(params)
+
+    return regressions
+
+
+def train_matrix_statistics(
+    training_data: DataFrame, slices: dict, predictors: list, predictand: str
+) -> list:
+    """Calculates the sufficient statistics of each (station_id, lead_time)
+    group of a training matrix from get_training_matrix.
+
+    Args:
+        training_data (pd.DataFrame): Training data with 'datetime', a column
+                                      for each predictor and 'obs'.
+        slices (dict): Row slice of each (station_id, lead_time) group.
+        predictors (list): Candidate predictor variables of the regressions.
+        predictand (str): Predictand variable of the regressions.
+
+    Returns:
+        list: Sufficient statistics of each group, as returned by
+              train_statistics.
+    """
+    x_values = training_data[list(predictors)].to_numpy(dtype=np.float64)
+    y_values = training_data["obs"].to_numpy(dtype=np.float64)
+
+    statistics = []
+    for (station_id, lead_time), rows in slices.items():
+        stats = _get_statistics(
+            x_values[rows],
+            y_values[rows],
+            training_data["datetime"].iloc[rows],
+            predictors,
+        )
+        stats["lead_time"] = lead_time
+        stats["station_id"] = station_id
+        stats["predictand"] = predictand
+        statistics.append(stats)
+
+    return statistics
+
+
+_SHARED_ARRAYS = {}
+
+
+def _share_arrays(arrays: dict) -> tuple:
+    """Copies numpy arrays into shared memory blocks.
+
+    Args:
+        arrays (dict): Arrays to share, by name.
+
+    Returns:
+        tuple: Shared memory blocks and the specification needed to attach
+               them, following {'name': (block_name, dtype, shape)}.
+    """
+    blocks = []
+    spec = {}
+    for name, array in arrays.items():
+        block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.dtype.str, array.shape)
+
+    return blocks, spec
+
+
+def _attach_arrays(spec: dict):
+    """Worker initializer attaching the shared memory arrays.
+
+    Args:
+        spec (dict): Specification returned by _share_arrays.
+    """
+    for name, (block_name, dtype, shape) in spec.items():
+        block = SharedMemory(name=block_name)
+        _SHARED_ARRAYS[name] = (
+            block,
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf),
+        )
+
+
+def _shared_matrix_task(task: tuple) -> dict:
+    """Trains the regression of a training matrix group from the shared
+    memory arrays of a worker.
+
+    Args:
+        task (tuple): (rows slice, predictors, selector).
+
+    Returns:
+        dict: Multiple linear regression parameters.
+    """
+    rows, predictors, selector = task
+
+    return _fit_regression(
+        _SHARED_ARRAYS["x_values"][1][rows],
+        _SHARED_ARRAYS["y_values"][1][rows],
+        predictors,
+        selector,
+    )
+
+
 class Forecaster:
     """Class to obtain MOS forecasts from multiple linear regressions."""
 
@@ -136,6 +732,60 @@ class Forecaster:
                 "'station_id', 'predictand'}"
             )
 
+        self._compile_regressions()
+
+    def _compile_regressions(self):
+        """Compiles the regressions DataFrame into dense arrays indexed by
+        [predictand, station, lead_time, predictor], so that a whole model run
+        can be scored with a single tensor product, and into a hashed index
+        of RegressionEntry records keyed by (station_id, lead_time,
+        predictand) for single point lookups.
+        """
+        df_regression = self.df_regression.drop_duplicates(
+            ["lead_time", "station_id", "predictand"]
+        )
+
+        self.predictands = sorted(set(df_regression["predictand"]))
+        self.stations = sorted(set(df_regression["station_id"]))
+        self.lead_times = sorted(set(int(lt) for lt in df_regression["lead_time"]))
+        self.predictor_names = sorted(
+            set(var for predictors in df_regression["predictors"] for var in predictors)
+        )
+
+        self._predictand_idx = {var: i for i, var in enumerate(self.predictands)}
+        self._station_idx = {stat: i for i, stat in enumerate(self.stations)}
+        self._lead_time_idx = {lt: i for i, lt in enumerate(self.lead_times)}
+        self._predictor_idx = {var: i for i, var in enumerate(self.predictor_names)}
+
+        shape = (
+            len(self.predictands),
+            len(self.stations),
+            len(self.lead_times),
+            len(self.predictor_names),
+        )
+        self.coefs = np.zeros(shape)
+        self.predictor_mask = np.zeros(shape, dtype=bool)
+        self.intercepts = np.full(shape[:3], np.nan)
+        self.regression_index = {}
+
+        for regr in df_regression.itertuples():
+            i_p = self._predictand_idx[regr.predictand]
+            i_s = self._station_idx[regr.station_id]
+            i_l = self._lead_time_idx[int(regr.lead_time)]
+            i_v = [self._predictor_idx[var] for var in regr.predictors]
+
+            self.coefs[i_p, i_s, i_l, i_v] = regr.coefs
+            self.predictor_mask[i_p, i_s, i_l, i_v] = True
+            self.intercepts[i_p, i_s, i_l] = regr.intercept
+
+            self.regression_index[
+                (regr.station_id, int(regr.lead_time), regr.predictand)
+            ] = RegressionEntry(
+                tuple(regr.predictors),
+                np.asarray(regr.coefs, dtype=float),
+                float(regr.intercept),
+            )
+
     def forecast_point(
         self, station_id: str, model_data: DataFrame, predictand: str
     ) -> float:
@@ -153,56 +803,62 @@ class Forecaster:
             ValueError: If 'predictand' not in regressions parquet file.
             ValueError: If 'station_id' not in 'model_data' DataFrame.
             ValueError: If 'model_data' includes more than one lead time.
+            ValueError: If no regression found for 'station_id' and the lead
+                        time of 'model_data'.
 
         Returns:
             float: Forecast for station_id.
         """
-        if station_id not in list(self.df_regression["station_id"]):
+        if station_id not in self._station_idx:
             raise ValueError(
                 "Point " + station_id + " not found in " "regressions parquet file."
             )
-        if station_id not in list(model_data["station_id"]):
+        if predictand not in self._predictand_idx:
+            raise ValueError(
+                predictand + " not found in regression file. "
+                "Predictands available: " + str(self.predictands)
+            )
+
+        point_data = model_data.loc[model_data["station_id"] == station_id]
+        if len(point_data) == 0:
             raise ValueError(
                 "Point " + station_id + " not found in model_data" " DataFrame."
             )
-        if len(set(model_data["lead_time"])) != 1:
+        if model_data["lead_time"].nunique() != 1:
             raise ValueError(
                 "Too many lead times in model_data. model_data "
                 "must contain only data corresponding to one lead"
                 " time."
             )
-        if predictand not in list(set(self.df_regression["predictand"])):
-            raise ValueError(
-                predictand + " not found in regression file. "
-                "Predictands available: "
-                + str(list(set(self.df_regression["predictand"])))
-            )
 
         lead_time = int(model_data["lead_time"].iloc[0])
-        point_data = model_data.loc[model_data["station_id"] == station_id]
-
-        point_regression = self.df_regression[
-            (self.df_regression["station_id"] == station_id)
-            & (self.df_regression["lead_time"] == lead_time)
-            & (self.df_regression["predictand"] == predictand)
-        ].drop_duplicates(["lead_time", "station_id", "predictand"])
-
-        point_regression = point_regression.reset_index()
-
-        predictor_values = []
-        coefficients = []
-        for i, var in enumerate(point_regression["predictors"][0]):
-            predictor_values.append(
-                float(point_data.loc[point_data["variable"] == var, "value"].iloc[0])
+        point_regression = self.regression_index.get(
+            (station_id, lead_time, predictand)
+        )
+        if point_regression is None:
+            raise ValueError(
+                "Point "
+                + station_id
+                + " not found in regressions parquet file for lead time "
+                + str(lead_time)
+                + "."
             )
-            coefficients.append(point_regression["coefs"][0][i])
+
+        point_values = dict(
+            to_long_layout(point_data)
+            .drop_duplicates("variable")[["variable", "value"]]
+            .values
+        )
+        predictor_values = np.array(
+            [float(point_values[var]) for var in point_regression.predictors]
+        )
 
         forecast = (
-            sum(np.array(predictor_values) * np.array(coefficients))
-            + point_regression["intercept"]
+            np.dot(predictor_values, point_regression.coefs)
+            + point_regression.intercept
         )
 
-        return float(forecast.iloc[0])
+        return float(forecast)
 
     def forecast_points(
         self, stations_id: list, model_data: DataFrame, predictand: str
@@ -253,3 +909,119 @@ class Forecaster:
                     raise
 
         return forecast
+
+    def forecast_run(
+        self, model_data: DataFrame, predictand: str, stations_id: list = None
+    ) -> DataFrame:
+        """Calculates the forecast for all points and lead times of one NWP
+        model run at once. Model data is pivoted into a [station, lead_time,
+        predictor] array and multiplied with the compiled coefficients. Points
+        or lead times without regression or model data get np.nan as forecast.
+
+        Args:
+            model_data (pd.DataFrame): DataFrame of NWP model data for a
+                                       single model run and any number of
+                                       lead times.
+            predictand (str): Variable to use as predictand.
+            stations_id (list, optional): Point or station identification
+                                          codes to forecast. Defaults to None
+                                          (all stations with regression).
+
+        Raises:
+            ValueError: If 'predictand' not in regressions parquet file.
+            ValueError: If 'model_data' includes more than one model run.
+
+        Returns:
+            pd.DataFrame: Forecast with columns 'run_datetime', 'station_id',
+                          'lead_time' and 'forecast'.
+        """
+        if predictand not in self._predictand_idx:
+            raise ValueError(
+                predictand + " not found in regression file. "
+                "Predictands available: " + str(self.predictands)
+            )
+        if model_data["run_datetime"].nunique() > 1:
+            raise ValueError(
+                "Too many model runs in model_data. model_data "
+                "must contain only data corresponding to one run."
+            )
+        return self.forecast_runs(model_data, predictand, stations_id)
+
+    def forecast_runs(
+        self, model_data: DataFrame, predictand: str, stations_id: list = None
+    ) -> DataFrame:
+        """Calculates the forecast for all points and lead times of multiple
+        NWP model runs at once. Model data is pivoted into a [run, station,
+        lead_time, predictor] array and multiplied with the compiled
+        coefficients. Points or lead times without regression or model data get
+        np.nan as forecast.
+
+        Args:
+            model_data (pd.DataFrame): DataFrame of NWP model data for any
+                                       number of model runs and lead times,
+                                       in long or wide layout.
+            predictand (str): Variable to use as predictand.
+            stations_id (list, optional): Point or station identification
+                                          codes to forecast. Defaults to None
+                                          (all stations with regression).
+
+        Raises:
+            ValueError: If 'predictand' not in regressions parquet file.
+
+        Returns:
+            pd.DataFrame: Forecast with columns 'run_datetime', 'station_id',
+                          'lead_time' and 'forecast', sorted by run.
+        """
+        if predictand not in self._predictand_idx:
+            raise ValueError(
+                predictand + " not found in regression file. "
+                "Predictands available: " + str(self.predictands)
+            )
+        if stations_id is None:
+            stations_id = self.stations
+
+        i_p = self._predictand_idx[predictand]
+        n_s, n_l, n_v = self.coefs.shape[1:]
+
+        runs = pd.Index(model_data["run_datetime"].unique()).sort_values()
+        i_r = runs.get_indexer(model_data["run_datetime"])
+        i_s = pd.Index(self.stations).get_indexer(model_data["station_id"])
+        i_l = pd.Index(self.lead_times).get_indexer(model_data["lead_time"])
+
+        predictor_values = np.full((len(runs), n_s, n_l, n_v), np.nan)
+        if is_wide_layout(model_data):
+            valid = (i_s >= 0) & (i_l >= 0)
+            predictor_values[i_r[valid], i_s[valid], i_l[valid]] = model_data.reindex(
+                columns=self.predictor_names
+            ).to_numpy(dtype=float)[valid]
+        else:
+            i_v = pd.Index(self.predictor_names).get_indexer(model_data["variable"])
+            valid = (i_s >= 0) & (i_l >= 0) & (i_v >= 0)
+            predictor_values[i_r[valid], i_s[valid], i_l[valid], i_v[valid]] = (
+                model_data["value"].to_numpy()[valid]
+            )
+        # Predictors not used by a regression must not propagate NaN values
+        predictor_values = np.where(self.predictor_mask[i_p], predictor_values, 0.0)
+
+        forecast = (
+            np.einsum("rslv,slv->rsl", predictor_values, self.coefs[i_p])
+            + self.intercepts[i_p]
+        )
+
+        # Requested points without regression are filled with NaN
+        forecast = np.concatenate(
+            (forecast, np.full((len(runs), 1, n_l), np.nan)), axis=1
+        )
+        rows = pd.Index(self.stations).get_indexer(stations_id)
+        forecast = forecast[:, rows]
+
+        return DataFrame(
+            {
+                "run_datetime": np.repeat(runs, len(stations_id) * n_l),
+                "station_id": np.tile(
+                    np.repeat(np.asarray(stations_id, dtype=object), n_l), len(runs)
+                ),
+                "lead_time": np.tile(self.lead_times, len(runs) * len(stations_id)),
+                "forecast": forecast.ravel(),
+            }
+        )
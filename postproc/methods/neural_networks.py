@@ -1,5 +1,26 @@
+import numpy as np
+import pyarrow.parquet as pq
 import tensorflow as tf
 
+# Input features of the DNN, in order
+FEATURES = [
+    "lead_time",
+    "10u",
+    "10v",
+    "2d",
+    "2t",
+    "alb_rad",
+    "clch",
+    "clcl",
+    "clcm",
+    "clct",
+    "hzerocl",
+    "qv_s",
+    "sp",
+    "tp",
+    "vmax_10m",
+]
+
 
 def create_dnn_architecture(n_features: int, embedding_dim: int, max_id: int):
     """Creates a Dense Neural Network Architecture.
@@ -26,3 +47,96 @@ def create_dnn_architecture(n_features: int, embedding_dim: int, max_id: int):
     dnn = tf.keras.Model(inputs=[features_in, id_in], outputs=x)
 
     return dnn
+
+
+def _read_feature_batches(features_file, features: list):
+    """Reads a features parquet file by row groups.
+
+    Args:
+        features_file (str or bytes): Path to a features parquet file.
+        features (list): Feature columns.
+
+    Yields:
+        tuple: ((features, station tokens), target) arrays of a row group.
+    """
+    if isinstance(features_file, bytes):
+        features_file = features_file.decode()
+    features = [
+        feature.decode() if isinstance(feature, bytes) else feature
+        for feature in features
+    ]
+
+    parquet_file = pq.ParquetFile(features_file)
+    for i in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(
+            i, columns=features + ["station_token_id", "obs"]
+        )
+        x_values = np.column_stack(
+            [table.column(feature).to_numpy() for feature in features]
+        ).astype(np.float32)
+        yield (
+            (x_values, table.column("station_token_id").to_numpy().astype(np.int32)),
+            table.column("obs").to_numpy().astype(np.float32),
+        )
+
+
+def create_dataset(
+    features_files: list,
+    features: list = None,
+    batch_size: int = 512,
+    shuffle_buffer: int = None,
+    cycle_length: int = 4,
+) -> tf.data.Dataset:
+    """Creates a streaming dataset from features parquet files (see
+    postproc.io.parquet.write_features). Files are read by row groups,
+    interleaving cycle_length files in parallel, so the whole dataset is
+    never held in memory.
+
+    Args:
+        features_files (list): Paths to features parquet files.
+        features (list, optional): Feature columns. Defaults to None
+                                   (FEATURES).
+        batch_size (int, optional): Batch size. Defaults to 512.
+        shuffle_buffer (int, optional): Number of samples of the shuffle
+                                        buffer. Defaults to None (no
+                                        shuffle, deterministic order).
+        cycle_length (int, optional): Number of files read at the same
+                                      time. Defaults to 4.
+
+    Returns:
+        tf.data.Dataset: Dataset of ((features, station tokens), target)
+                         batches, as expected by create_dnn_architecture
+                         models.
+    """
+    if features is None:
+        features = FEATURES
+
+    output_signature = (
+        (
+            tf.TensorSpec(shape=(None, len(features)), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int32),
+        ),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+
+    dataset = tf.data.Dataset.from_tensor_slices(list(features_files))
+    if shuffle_buffer is not None:
+        dataset = dataset.shuffle(len(features_files))
+
+    dataset = dataset.interleave(
+        lambda features_file: tf.data.Dataset.from_generator(
+            _read_feature_batches,
+            args=(features_file, features),
+            output_signature=output_signature,
+        ),
+        cycle_length=cycle_length,
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=shuffle_buffer is None,
+    )
+
+    if shuffle_buffer is not None:
+        dataset = dataset.unbatch().shuffle(shuffle_buffer).batch(batch_size)
+    else:
+        dataset = dataset.rebatch(batch_size)
+
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -1,12 +1,258 @@
+from collections import OrderedDict
+from itertools import compress
+from multiprocessing import Pool, cpu_count
+from os import makedirs, replace
+from os.path import exists, join
+from urllib.parse import quote
+
 from pandas import DataFrame
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-import pickle
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
 import pandas as pd
 
+from postproc.io.parquet import get_model_variables, to_wide_layout
+from postproc.utils.arrays import group_slices
+
+# Node of a flattened tree. Leaves point to themselves.
+NODE_DTYPE = np.dtype(
+    [
+        ("feature", "<i4"),
+        ("threshold", "<f4"),
+        ("left", "<i4"),
+        ("right", "<i4"),
+        ("value", "<f8"),
+    ]
+)
+
+
+def flatten_forest(rf_model: RandomForestRegressor) -> tuple:
+    """Flattens the trees of a Random Forest model into one node array.
+    Thresholds are rounded down to float32, which gives the same splits as
+    sklearn since input features are compared as float32.
+
+    Args:
+        rf_model (RandomForestRegressor): Trained Random Forest model.
+
+    Returns:
+        tuple: Nodes of all trees (NODE_DTYPE) and the root node of each
+               tree.
+    """
+    trees = [estimator.tree_ for estimator in rf_model.estimators_]
+    sizes = [tree.node_count for tree in trees]
+    roots = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int32)
+
+    nodes = np.empty(sum(sizes), dtype=NODE_DTYPE)
+    for root, tree in zip(roots, trees):
+        rows = slice(root, root + tree.node_count)
+        node_ids = np.arange(tree.node_count) + root
+        leaf = tree.children_left == -1
+
+        threshold = tree.threshold.astype(np.float32)
+        rounded_up = threshold > tree.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], -np.inf)
+
+        nodes["feature"][rows] = np.where(leaf, 0, tree.feature)
+        nodes["threshold"][rows] = np.where(leaf, np.inf, threshold)
+        nodes["left"][rows] = np.where(leaf, node_ids, tree.children_left + root)
+        nodes["right"][rows] = np.where(leaf, node_ids, tree.children_right + root)
+        nodes["value"][rows] = tree.value[:, 0, 0]
+
+    return nodes, roots
+
+
+def predict_forest(nodes: np.ndarray, roots: np.ndarray, x_values) -> np.ndarray:
+    """Predicts with a flattened Random Forest model. All trees are traversed
+    for all samples at once, advancing only the (sample, tree) pairs that
+    have not reached a leaf. Gives the same predictions as sklearn.
+
+    Args:
+        nodes (np.ndarray): Nodes of all trees (NODE_DTYPE).
+        roots (np.ndarray): Root node of each tree.
+        x_values (array-like): Predictor values (samples, predictors).
+
+    Returns:
+        np.ndarray: Mean prediction of all trees.
+    """
+    x_values = np.asarray(x_values, dtype=np.float32)
+    if len(x_values) == 0:
+        return np.zeros(0)
+
+    feature = nodes["feature"]
+    threshold = nodes["threshold"]
+    left = nodes["left"]
+    right = nodes["right"]
+
+    n_samples, n_trees = len(x_values), len(roots)
+    node = np.tile(np.asarray(roots, dtype=np.int32), n_samples)
+    sample = np.repeat(np.arange(n_samples), n_trees)
+
+    active = np.flatnonzero(left[node] != node)
+    while len(active) > 0:
+        current = node[active]
+        go_left = x_values[sample[active], feature[current]] <= threshold[current]
+        node[active] = np.where(go_left, left[current], right[current])
+        active = active[left[node[active]] != node[active]]
+
+    # Trees are added one after the other, as sklearn does, to get the same
+    # rounding
+    values = nodes["value"][node].reshape(n_samples, n_trees)
+
+    return np.cumsum(values, axis=1)[:, -1] / n_trees
+
+
+class RandomForestStore:
+    """Class to save and lazily load flattened Random Forest models by
+    station, lead time and predictand."""
+
+    def __init__(self, store_dir: str, cache_size: int = 256):
+        """Inits RandomForestStore class with a store directory.
+
+        Args:
+            store_dir (str): Directory of the model store. Created if it does
+                             not exist.
+            cache_size (int, optional): Maximum number of models kept in
+                                        memory. Defaults to 256.
+        """
+        if not exists(store_dir):
+            makedirs(store_dir)
+
+        self.store_dir = store_dir
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _path(self, station_id: str, lead_time: int, predictand: str) -> str:
+        return join(
+            self.store_dir,
+            quote(str(predictand), safe="")
+            + "_lt"
+            + str(lead_time).zfill(2)
+            + "_"
+            + quote(str(station_id), safe=""),
+        )
+
+    def __contains__(self, key: tuple) -> bool:
+        return exists(self._path(*key) + ".nodes.npy")
+
+    def save(
+        self,
+        station_id: str,
+        lead_time: int,
+        predictand: str,
+        rf_model: RandomForestRegressor,
+        predictors: list,
+    ):
+        """Flattens and saves a Random Forest model with its predictors.
+        Files are renamed once written, so a model is either complete or
+        absent.
+
+        Args:
+            station_id (str): Station identification code.
+            lead_time (int): Lead time of the model.
+            predictand (str): Variable predicted by the model.
+            rf_model (RandomForestRegressor): Trained Random Forest model.
+            predictors (list): Predictor variables, in the order of the
+                               features the model was trained with.
+
+        Raises:
+            ValueError: If the number of predictors does not match the model.
+        """
+        if len(predictors) != rf_model.n_features_in_:
+            raise ValueError(
+                "Model trained with "
+                + str(rf_model.n_features_in_)
+                + " features, but "
+                + str(len(predictors))
+                + " predictors given."
+            )
+
+        nodes, roots = flatten_forest(rf_model)
+        path = self._path(station_id, lead_time, predictand)
+
+        # Nodes are written last, as they mark a complete model
+        for suffix, array in [
+            (".predictors.npy", np.array(predictors, dtype=str)),
+            (".roots.npy", roots),
+            (".nodes.npy", nodes),
+        ]:
+            with open(path + suffix + ".tmp", "wb") as f:
+                np.save(f, array)
+            replace(path + suffix + ".tmp", path + suffix)
+
+        self._cache.pop((station_id, lead_time, predictand), None)
+
+    def load(self, station_id: str, lead_time: int, predictand: str) -> tuple:
+        """Loads a flattened Random Forest model as memory-mapped arrays.
+
+        Args:
+            station_id (str): Station identification code.
+            lead_time (int): Lead time of the model.
+            predictand (str): Variable predicted by the model.
+
+        Returns:
+            tuple: Nodes, roots and predictors of the model, or None if not in
+                   the store.
+        """
+        key = (station_id, lead_time, predictand)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if key not in self:
+            return None
+
+        path = self._path(station_id, lead_time, predictand)
+        model = (
+            np.load(path + ".nodes.npy", mmap_mode="r"),
+            np.load(path + ".roots.npy"),
+            list(np.load(path + ".predictors.npy")),
+        )
+
+        self._cache[key] = model
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return model
+
+    def predict(
+        self, station_id: str, lead_time: int, predictand: str, x_values
+    ) -> np.ndarray:
+        """Predicts with the model of a station, lead time and predictand.
+
+        Args:
+            station_id (str): Station identification code.
+            lead_time (int): Lead time of the model.
+            predictand (str): Variable predicted by the model.
+            x_values (array-like): Predictor values (samples, predictors), in
+                                   the order of the model predictors.
+
+        Raises:
+            KeyError: If the model is not in the store.
+
+        Returns:
+            np.ndarray: Predictions.
+        """
+        model = self.load(station_id, lead_time, predictand)
+        if model is None:
+            raise KeyError(
+                "Model of "
+                + str(predictand)
+                + ", "
+                + str(station_id)
+                + " and lead time "
+                + str(lead_time)
+                + " not found in "
+                + self.store_dir
+                + "."
+            )
+
+        return predict_forest(model[0], model[1], x_values)
+
 
 def get_station_rf_model(
-    station_data: DataFrame, model_data: DataFrame, predictand: str, predictors: list
+    station_data: DataFrame,
+    model_data: DataFrame,
+    predictand: str,
+    predictors: list,
+    n_jobs: int = None,
 ) -> dict:
     """Calculates Random Forest model for a specific location using NWP model data.
 
@@ -16,6 +262,8 @@ def get_station_rf_model(
         model_data (pd.DataFrame): Historical NWP model data.
         predictand (str): Predictand variable of the regression.
         predictors (list): Predictor variables of the regression.
+        n_jobs (int, optional): Number of jobs to fit the trees. Defaults to
+                                None.
 
     Returns:
         dict: Multiple linear regression parameters (score, coefficients,
@@ -25,15 +273,14 @@ def get_station_rf_model(
         obs=station_data[station_data["variable"] == predictand]["value"]
     )
 
-    model_data = model_data.drop_duplicates()
-    model_data = model_data.pivot(
-        index=["datetime"], columns=["variable"], values="value"
-    ).reset_index()
+    model_data = to_wide_layout(model_data).sort_values("datetime")
 
     if predictors is None:
-        predictors = model_data.columns[1:]
+        predictors = get_model_variables(model_data)
 
-    data = model_data.merge(station_data[["datetime", "obs"]], on=["datetime"])
+    data = model_data[["datetime"] + list(predictors)].merge(
+        station_data[["datetime", "obs"]], on=["datetime"]
+    )
 
     if len(data) < 850:
         return None
@@ -41,62 +288,91 @@ def get_station_rf_model(
     y_values = np.array(data["obs"])
     x_values = np.array(data[predictors])
 
-    rf_regr = RandomForestRegressor().fit(x_values, y_values)
+    rf_regr = RandomForestRegressor(n_jobs=n_jobs).fit(x_values, y_values)
 
     return rf_regr
 
 
 def forecast_hourly(
-    model_data: pd.DataFrame, stations_id: list, predictand: str, config: dict
+    model_data: pd.DataFrame,
+    stations_id: list,
+    predictand: str,
+    config: dict,
+    store: RandomForestStore = None,
 ) -> pd.DataFrame:
     """Obtains hourly forecasts of a specified predictand for each station in
-    stations_id.
+    stations_id. Model data is pivoted once into a feature matrix with a row
+    per (station, lead_time, run), and each Random Forest model predicts all
+    its rows in one call, with the features reindexed to the predictors it
+    was trained with. Stations and lead times without model or with missing
+    NWP data (values or whole variables) get np.nan as forecast.
 
     Args:
-        model_data (DataFrame): Data from a NWP model for specific points.
+        model_data (DataFrame): Data from a NWP model for specific points and
+                                one or more runs.
         stations_id (list): Station id points to obtain a forecast.
         predictand (str): Variable to forecast.
         config (dict): Configuration dictionary.
+        store (RandomForestStore, optional): Model store, to keep loaded
+                                             models between calls. Defaults
+                                             to None (store in
+                                             config['random_forest']
+                                             ['rf_store']).
 
     Returns:
         DataFrame: Hourly forecast for a specific variable and for each
-                   station.
+                   station, with columns 'run_datetime', 'station_id',
+                   'lead_time' and 'forecast'.
     """
-    results = []
-    for lead_time in range(config["lead_times"]):
-        regression_file = config["random_forest"]["rf_model"].format(
-            lead_time=lead_time
-        )
-        with open(regression_file, "rb") as f:
-            regressions = pickle.load(f)
-        model_lt = model_data.loc[model_data["lead_time"] == lead_time]
-        for station_id in stations_id:
-            if len(regressions[station_id]) == 0:
-                continue
-            point_data = model_lt.loc[model_lt["station_id"] == station_id]
-            point_data = point_data.pivot(
-                index=["lead_time", "run_datetime", "station_id"],
-                columns="variable",
-                values="value",
-            ).iloc[0]
-            point_data = np.array(point_data).reshape(1, -1)
-
-            fct_point = regressions[station_id][0].predict(point_data)
-
-            forecast = {
-                "run_datetime": model_data["run_datetime"].iloc[0],
-                "station_id": station_id,
-                "lead_time": lead_time,
-                "forecast": fct_point[0],
-            }
-
-            results.append(forecast)
-
-    return results
+    if store is None:
+        store = RandomForestStore(config["random_forest"]["rf_store"])
+
+    lead_times = range(config["lead_times"])
+    runs = np.sort(model_data["run_datetime"].unique())
+
+    model_data = to_wide_layout(model_data)
+    variables = pd.Index(get_model_variables(model_data))
+    features = model_data.set_index(["station_id", "lead_time", "run_datetime"])[
+        variables
+    ].reindex(pd.MultiIndex.from_product([stations_id, lead_times, runs]))
+    x_values = features.to_numpy(dtype=float)
+    station_keys = features.index.get_level_values(0).to_numpy()
+    lead_time_keys = features.index.get_level_values(1).to_numpy()
+
+    model_slices = group_slices([station_keys, lead_time_keys])
+    available = np.array([key + (predictand,) in store for key in model_slices])
+
+    forecast = np.full(len(x_values), np.nan)
+    for key, rows in compress(model_slices.items(), available):
+        # Columns of the model predictors, in training order. Models with a
+        # predictor missing in the run are not used
+        columns = variables.get_indexer(store.load(*key, predictand)[2])
+        if (columns < 0).any():
+            continue
+        x_model = x_values[rows][:, columns]
+        valid = ~np.isnan(x_model).any(axis=1)
+        if valid.any():
+            forecast[np.arange(rows.start, rows.stop)[valid]] = store.predict(
+                *key, predictand, x_model[valid]
+            )
+
+    return DataFrame(
+        {
+            "run_datetime": features.index.get_level_values(2),
+            "station_id": station_keys,
+            "lead_time": lead_time_keys,
+            "forecast": forecast,
+        }
+    )
 
 
 def train_rf_model(
-    station_id: str, model_data: pd.DataFrame, station_data: pd.DataFrame, var: str
+    station_id: str,
+    model_data: pd.DataFrame,
+    station_data: pd.DataFrame,
+    var: str,
+    n_jobs: int = None,
+    predictors: list = None,
 ) -> RandomForestRegressor:
     """Trains a Random Forest model using the provided data for a specific station.
 
@@ -105,6 +381,11 @@ def train_rf_model(
         model_data (pd.DataFrame): The DataFrame containing the model input features for training.
         station_data (pd.DataFrame): The DataFrame containing the station input target for training.
         var (str): Name of the variable to predict.
+        n_jobs (int, optional): Number of jobs to fit the trees. Defaults to
+                                None.
+        predictors (list, optional): Predictor variables, in this order.
+                                     Defaults to None (all model variables,
+                                     sorted by name).
 
     Returns:
         RandomForestRegressor: The trained Random Forest model.
@@ -119,7 +400,7 @@ def train_rf_model(
 
     if len(station_f) > 365:
         rf_model = get_station_rf_model(
-            station_f, model_f, predictand=var, predictors=None
+            station_f, model_f, predictand=var, predictors=predictors, n_jobs=n_jobs
         )
         if rf_model is None:
             return None
@@ -127,3 +408,320 @@ def train_rf_model(
         return rf_model
 
     return None
+
+
+_TRAINING_DATA = {}
+
+
+def _init_rf_worker(training_data, store_dir: str, var: str, n_jobs: int):
+    """Worker initializer keeping the training data and task settings.
+
+    Args:
+        training_data: Training data, a TrainingDataProvider or the
+                       (x_values, y_values, predictors) of a training matrix.
+        store_dir (str): Directory of the model store.
+        var (str): Name of the variable to predict.
+        n_jobs (int): Number of jobs to fit the trees of each model.
+    """
+    _TRAINING_DATA["data"] = training_data
+    _TRAINING_DATA["store"] = RandomForestStore(store_dir)
+    _TRAINING_DATA["var"] = var
+    _TRAINING_DATA["n_jobs"] = n_jobs
+
+
+def _train_rf_task(task: tuple) -> tuple:
+    """Trains and saves the Random Forest model of a station and lead time.
+
+    Args:
+        task (tuple): (station_id, lead_time).
+
+    Returns:
+        tuple: (station_id, lead_time, True if a model was saved).
+    """
+    station_id, lead_time = task
+    var = _TRAINING_DATA["var"]
+
+    model_data, station_data = _TRAINING_DATA["data"].get_station_data(
+        station_id, lead_time, var
+    )
+    predictors = get_model_variables(model_data)
+    rf_model = train_rf_model(
+        station_id,
+        model_data,
+        station_data,
+        var,
+        n_jobs=_TRAINING_DATA["n_jobs"],
+        predictors=predictors,
+    )
+    if rf_model is None:
+        return station_id, lead_time, False
+
+    _TRAINING_DATA["store"].save(station_id, lead_time, var, rf_model, predictors)
+
+    return station_id, lead_time, True
+
+
+def train_rf_models(
+    stations_id: list,
+    lead_times: list,
+    training_data,
+    var: str,
+    store: RandomForestStore,
+    n_workers: int = None,
+    n_jobs: int = 1,
+):
+    """Trains the Random Forest models of each station and lead time in a pool
+    of processes. Each model is saved to the store as soon as it is trained
+    and models already in the store are skipped, so an interrupted training
+    can be resumed.
+
+    Args:
+        stations_id (list): Station identification codes.
+        lead_times (list): Lead times.
+        training_data (TrainingDataProvider): Training data.
+        var (str): Name of the variable to predict.
+        store (RandomForestStore): Model store.
+        n_workers (int, optional): Number of processes. Defaults to None
+                                   (number of CPUs divided by n_jobs).
+        n_jobs (int, optional): Number of jobs to fit the trees of each
+                                model. Defaults to 1.
+
+    Yields:
+        tuple: (station_id, lead_time, True if a model was saved) for each
+               finished task, in order of completion.
+    """
+    if n_workers is None:
+        n_workers = max(1, cpu_count() // n_jobs)
+
+    tasks = [
+        (station_id, lead_time)
+        for lead_time in lead_times
+        for station_id in stations_id
+        if (station_id, lead_time, var) not in store
+    ]
+
+    with Pool(
+        processes=n_workers,
+        initializer=_init_rf_worker,
+        initargs=(training_data, store.store_dir, var, n_jobs),
+    ) as pool:
+        yield from pool.imap_unordered(_train_rf_task, tasks)
+
+
+def _train_matrix_rf_task(task: tuple) -> tuple:
+    """Trains and saves the Random Forest model of a training matrix group.
+
+    Args:
+        task (tuple): (station_id, lead_time, rows slice).
+
+    Returns:
+        tuple: (station_id, lead_time, True).
+    """
+    station_id, lead_time, rows = task
+    x_values, y_values, predictors = _TRAINING_DATA["data"]
+
+    rf_model = RandomForestRegressor(n_jobs=_TRAINING_DATA["n_jobs"]).fit(
+        x_values[rows], y_values[rows]
+    )
+    _TRAINING_DATA["store"].save(
+        station_id, lead_time, _TRAINING_DATA["var"], rf_model, predictors
+    )
+
+    return station_id, lead_time, True
+
+
+def train_matrix_rf_models(
+    training_data: pd.DataFrame,
+    slices: dict,
+    predictors: list,
+    predictand: str,
+    store: RandomForestStore,
+    n_workers: int = None,
+    n_jobs: int = 1,
+):
+    """Trains and saves the Random Forest model of each (station_id,
+    lead_time) group of a training matrix from get_training_matrix, which
+    already holds only groups with enough samples, in a pool of processes.
+    Models already in the store are skipped.
+
+    Args:
+        training_data (pd.DataFrame): Training data with a column for each
+                                      predictor and 'obs'.
+        slices (dict): Row slice of each (station_id, lead_time) group.
+        predictors (list): Predictor variables.
+        predictand (str): Name of the variable to predict.
+        store (RandomForestStore): Model store.
+        n_workers (int, optional): Number of processes. Defaults to None
+                                   (number of CPUs divided by n_jobs).
+        n_jobs (int, optional): Number of jobs to fit the trees of each
+                                model. Defaults to 1.
+
+    Yields:
+        tuple: (station_id, lead_time, True if a model was saved) for each
+               group, skipped ones first and then in order of completion.
+    """
+    if n_workers is None:
+        n_workers = max(1, cpu_count() // n_jobs)
+
+    x_values = training_data[list(predictors)].to_numpy()
+    y_values = training_data["obs"].to_numpy()
+
+    tasks = []
+    for (station_id, lead_time), rows in slices.items():
+        if (station_id, lead_time, predictand) in store:
+            yield station_id, lead_time, False
+        else:
+            tasks.append((station_id, lead_time, rows))
+
+    with Pool(
+        processes=n_workers,
+        initializer=_init_rf_worker,
+        initargs=(
+            (x_values, y_values, list(predictors)),
+            store.store_dir,
+            predictand,
+            n_jobs,
+        ),
+    ) as pool:
+        yield from pool.imap_unordered(_train_matrix_rf_task, tasks)
+
+
+def get_pooled_features(model_data: DataFrame, stations_md: DataFrame) -> DataFrame:
+    """Pivots NWP model data of all stations and lead times into a feature
+    table with a row per (station_id, run_datetime, lead_time) and the valid
+    datetime, adding the station metadata.
+
+    Args:
+        model_data (pd.DataFrame): NWP model data, in long or wide layout.
+        stations_md (pd.DataFrame): Stations metadata ('station_id', 'lon'
+                                    and 'lat').
+
+    Returns:
+        pd.DataFrame: Feature table.
+    """
+    features = to_wide_layout(model_data).sort_values(
+        ["station_id", "run_datetime", "lead_time"]
+    )
+    features = features.merge(
+        stations_md[["station_id", "lon", "lat"]], on="station_id", how="left"
+    )
+
+    return features
+
+
+def train_pooled_model(
+    model_data: DataFrame,
+    station_data: DataFrame,
+    stations_md: DataFrame,
+    var: str,
+    lead_time_buckets: list = None,
+) -> dict:
+    """Trains a single histogram-based gradient boosting model for all
+    stations and lead times, or one for each lead time bucket. Station token,
+    lead time and station coordinates are used as features together with NWP
+    variables, so stations with few samples share information with the rest.
+
+    Args:
+        model_data (pd.DataFrame): Historical NWP model data of all stations
+                                   and lead times.
+        station_data (pd.DataFrame): Historical observational data.
+        stations_md (pd.DataFrame): Stations metadata ('station_id', 'lon'
+                                    and 'lat'). At most 255 stations, the
+                                    maximum number of categories.
+        var (str): Name of the variable to predict.
+        lead_time_buckets (list, optional): Edges of the lead time buckets,
+                                            e.g. [0, 13, 25, 49] trains
+                                            models for lead times 0-12, 13-24
+                                            and 25-48. Defaults to None (one
+                                            model).
+
+    Returns:
+        dict: Pooled model with 'predictors', 'stations', 'lead_time_buckets'
+              and 'models' (one per bucket).
+    """
+    stations = list(stations_md["station_id"])
+
+    features = get_pooled_features(model_data, stations_md)
+    predictors = get_model_variables(model_data)
+    features["station_token"] = pd.Index(stations).get_indexer(features["station_id"])
+
+    obs = station_data.loc[station_data["variable"] == var]
+    data = features.merge(
+        obs[["station_id", "datetime", "value"]].rename(columns={"value": "obs"}),
+        on=["station_id", "datetime"],
+    ).dropna(subset=predictors + ["obs"])
+
+    # Stations and lead times with few samples are left out, as in the
+    # per-station models
+    counts = data.groupby(["station_id", "lead_time"])["obs"].transform("count")
+    data = data.loc[counts >= 850]
+
+    predictors = predictors + ["lead_time", "lon", "lat", "station_token"]
+
+    if lead_time_buckets is None:
+        lead_time_buckets = [0, int(model_data["lead_time"].max()) + 1]
+
+    models = []
+    for lt_0, lt_1 in zip(lead_time_buckets[:-1], lead_time_buckets[1:]):
+        bucket = data.loc[(data["lead_time"] >= lt_0) & (data["lead_time"] < lt_1)]
+        model = HistGradientBoostingRegressor(
+            categorical_features=[predictors.index("station_token")]
+        )
+        models.append(model.fit(np.array(bucket[predictors]), np.array(bucket["obs"])))
+
+    return {
+        "predictors": predictors,
+        "stations": stations,
+        "lead_time_buckets": list(lead_time_buckets),
+        "models": models,
+    }
+
+
+def forecast_pooled(
+    model_data: DataFrame,
+    stations_id: list,
+    pooled_model: dict,
+    stations_md: DataFrame,
+) -> DataFrame:
+    """Obtains hourly forecasts for each station in stations_id with a pooled
+    gradient boosting model.
+
+    Args:
+        model_data (DataFrame): Data from a NWP model for specific points and
+                                one or more runs.
+        stations_id (list): Station id points to obtain a forecast.
+        pooled_model (dict): Pooled model from train_pooled_model.
+        stations_md (pd.DataFrame): Stations metadata ('station_id', 'lon'
+                                    and 'lat').
+
+    Returns:
+        DataFrame: Hourly forecast for each station, with columns
+                   'run_datetime', 'station_id', 'lead_time' and 'forecast'.
+    """
+    features = get_pooled_features(
+        model_data.loc[model_data["station_id"].isin(stations_id)], stations_md
+    )
+    # Unknown stations get a negative token, handled as a missing category
+    features["station_token"] = pd.Index(pooled_model["stations"]).get_indexer(
+        features["station_id"]
+    )
+    x_values = np.array(features[pooled_model["predictors"]], dtype=float)
+
+    forecast = np.full(len(features), np.nan)
+    buckets = pooled_model["lead_time_buckets"]
+    for i, model in enumerate(pooled_model["models"]):
+        rows = np.flatnonzero(
+            (features["lead_time"] >= buckets[i])
+            & (features["lead_time"] < buckets[i + 1])
+        )
+        if len(rows) > 0:
+            forecast[rows] = model.predict(x_values[rows])
+
+    return DataFrame(
+        {
+            "run_datetime": features["run_datetime"],
+            "station_id": features["station_id"],
+            "lead_time": features["lead_time"],
+            "forecast": forecast,
+        }
+    )
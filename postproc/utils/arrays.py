@@ -0,0 +1,31 @@
+"""Module with array helpers.
+"""
+import numpy as np
+
+
+def group_slices(keys: list) -> dict:
+    """Calculates the row slice of each group of sorted key arrays.
+
+    Args:
+        keys (list): Key arrays sorted by group.
+
+    Returns:
+        dict: Row slice for each key tuple.
+    """
+    keys = [np.asarray(key) for key in keys]
+    n_rows = len(keys[0])
+    if n_rows == 0:
+        return {}
+
+    changes = np.zeros(n_rows - 1, dtype=bool)
+    for key in keys:
+        changes |= key[1:] != key[:-1]
+    bounds = np.concatenate(([0], np.flatnonzero(changes) + 1, [n_rows]))
+    group_keys = zip(*[key[bounds[:-1]].tolist() for key in keys])
+
+    return {
+        group_key: slice(i_0, i_1)
+        for group_key, i_0, i_1 in zip(
+            group_keys, bounds[:-1].tolist(), bounds[1:].tolist()
+        )
+    }
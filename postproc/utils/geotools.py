@@ -1,55 +1,468 @@
+import hashlib
+from os import getpid, makedirs, replace
+from os.path import exists, join
+
 import numpy as np
+import pandas as pd
 import pyproj
 import xarray
+from scipy import sparse
 from sklearn.neighbors import NearestNeighbors
 
+INTERPOLATION_METHODS = ["nearest", "bilinear", "idw", "knn_land"]
+
+
+def _nearest_index(grid: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # Nearest position of a 1D coordinate for each value. Ties are resolved
+    # to the lowest position, as np.argmin would do
+    order = np.argsort(grid, kind="stable")
+    pos = np.clip(np.searchsorted(grid[order], values), 1, len(grid) - 1)
+    left = order[pos - 1]
+    right = order[pos]
+
+    d_left = np.abs(grid[left] - values)
+    d_right = np.abs(grid[right] - values)
+
+    return np.where(
+        (d_right < d_left) | ((d_right == d_left) & (right < left)), right, left
+    )
+
+
+def _to_cartesian(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    # Points on the unit sphere, so euclidean distance ranks as great circle
+    # distance
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+
+    return np.column_stack(
+        (np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat))
+    )
+
+
+def _project_stations(
+    lsm: xarray.DataArray, stations_md, x_coord: str, y_coord: str
+) -> tuple:
+    # Grid coordinates and station coordinates in the grid CRS, in one
+    # transformation. Without CRS, grid coordinates are lon/lat
+    x_grid = np.asarray(lsm[x_coord].values, dtype=float)
+    y_grid = np.asarray(lsm[y_coord].values, dtype=float)
+
+    lats = stations_md["lat"].to_numpy(dtype=float)
+    lons = stations_md["lon"].to_numpy(dtype=float)
+
+    geographic = lsm.rio.crs is None
+    if geographic:
+        x_stat, y_stat = lons, lats
+    else:
+        proj = pyproj.Transformer.from_crs(
+            pyproj.CRS("EPSG:4326"), pyproj.CRS(lsm.rio.crs)
+        )
+        x_stat, y_stat = proj.transform(lats, lons)
+
+    return x_grid, y_grid, np.asarray(x_stat), np.asarray(y_stat), geographic
 
-def get_model_points(lsm: xarray.DataArray, stations_md) -> dict:
+
+def _to_points(x_values: np.ndarray, y_values: np.ndarray, geographic: bool):
+    if geographic:
+        return _to_cartesian(x_values, y_values)
+
+    return np.column_stack((x_values, y_values))
+
+
+def _grid_points(x_grid: np.ndarray, y_grid: np.ndarray, geographic: bool):
+    # Points of the grid in row-major order, as the raveled fields
+    if x_grid.ndim == 1:
+        x_grid, y_grid = np.meshgrid(x_grid, y_grid)
+
+    return _to_points(x_grid.ravel(), y_grid.ravel(), geographic)
+
+
+def get_model_points(
+    lsm: xarray.DataArray, stations_md, x_coord: str = "x", y_coord: str = "y"
+) -> dict:
     """Determine model point position (row, col) for each station.
     Only model grid point where landsea mask equals 1 are considered.
+    Stations are projected in one call, and stations on sea points are moved
+    to the nearest land point with one query to a tree of land points.
+    Regular grids (1D coordinates) and curvilinear or rotated grids (2D
+    coordinates) are supported. If the land-sea mask has no CRS, grid
+    coordinates are taken as longitude and latitude.
 
     Args:
-        lsm (xarray): Land-sea mask xarray.
+        lsm (xarray): Land-sea mask xarray, with dimensions (y, x).
         stations_md (pd.Dataframe): Stations metadatada.
+        x_coord (str, optional): Name of the x coordinate. Defaults to 'x'.
+        y_coord (str, optional): Name of the y coordinate. Defaults to 'y'.
     Returns:
         dict: Model point position for each station follwoing
         {'station_id': (row, col)}.
     """
-    dictionary_row_col = {}
+    x_grid, y_grid, x_stat, y_stat, geographic = _project_stations(
+        lsm, stations_md, x_coord, y_coord
+    )
+    lsm_values = np.asarray(lsm.values)
+
+    if x_grid.ndim == 1:
+        rows = _nearest_index(y_grid, y_stat)
+        cols = _nearest_index(x_grid, x_stat)
+    else:
+        nbrs = NearestNeighbors(n_neighbors=1, algorithm="kd_tree").fit(
+            _grid_points(x_grid, y_grid, geographic)
+        )
+        _, indices = nbrs.kneighbors(_to_points(x_stat, y_stat, geographic))
+        rows, cols = np.unravel_index(indices[:, 0], x_grid.shape)
+
+    sea = lsm_values[rows, cols] < 1
+    if sea.any():
+        neigh_candidates = np.argwhere(lsm_values == 1)
+
+        nbrs = NearestNeighbors(n_neighbors=1, algorithm="ball_tree").fit(
+            neigh_candidates
+        )
+
+        _, indices = nbrs.kneighbors(np.column_stack((rows[sea], cols[sea])))
+
+        rows[sea] = neigh_candidates[indices[:, 0], 0]
+        cols[sea] = neigh_candidates[indices[:, 0], 1]
 
-    for stat in stations_md.itertuples():
-        inproj = pyproj.CRS("EPSG:4326")
-        outproj = pyproj.CRS(lsm.rio.crs)
+    return {
+        station_id: (int(row), int(col))
+        for station_id, row, col in zip(stations_md["station_id"], rows, cols)
+    }
 
-        proj = pyproj.Transformer.from_crs(inproj, outproj)
 
-        x1 = lsm.x.values
-        y1 = lsm.y.values
+def _bilinear_weights(grid: np.ndarray, values: np.ndarray) -> tuple:
+    # Positions of the two grid coordinates around each value and weight of
+    # the second one. Values outside the grid take the border value
+    order = np.argsort(grid, kind="stable")
+    pos = np.clip(np.searchsorted(grid[order], values), 1, len(grid) - 1)
+    i_0 = order[pos - 1]
+    i_1 = order[pos]
 
-        x2, y2 = proj.transform(stat.lat, stat.lon)
+    weight = np.clip((values - grid[i_0]) / (grid[i_1] - grid[i_0]), 0.0, 1.0)
 
-        d_x = np.abs(x1 - np.array([x2]))
-        col = np.argmin(d_x)
+    return i_0, i_1, weight
 
-        d_y = np.abs(y1 - np.array([y2]))
-        row = np.argmin(d_y)
 
-        if lsm[row, col] < 1:
-            neigh_candidates = np.where(lsm == 1)
-            neigh_candidates = np.vstack((neigh_candidates[0], neigh_candidates[1])).T
-            neigh_needed = np.vstack((row, col)).T
+def get_interpolation_operator(
+    lsm: xarray.DataArray,
+    stations_md,
+    method: str = "nearest",
+    k: int = 4,
+    power: float = 2.0,
+    x_coord: str = "x",
+    y_coord: str = "y",
+) -> sparse.csr_matrix:
+    """Builds a sparse (stations, grid points) weight matrix to interpolate
+    model fields to the stations, so the values of all stations are a single
+    matrix product (see interpolate_points).
 
-            nbrs = NearestNeighbors(n_neighbors=1, algorithm="ball_tree").fit(
-                neigh_candidates
+    Methods:
+        - nearest: Nearest land point, as get_model_points.
+        - bilinear: Bilinear interpolation of the 4 surrounding grid points
+          (1D coordinates only).
+        - idw: Inverse distance weighting of the k nearest grid points.
+        - knn_land: Average of the k nearest land points.
+
+    Args:
+        lsm (xarray): Land-sea mask xarray, with dimensions (y, x).
+        stations_md (pd.Dataframe): Stations metadatada.
+        method (str, optional): Interpolation method. Defaults to 'nearest'.
+        k (int, optional): Number of grid points of 'idw' and 'knn_land'.
+                           Defaults to 4.
+        power (float, optional): Power of the distance of 'idw'. Defaults to
+                                 2.0.
+        x_coord (str, optional): Name of the x coordinate. Defaults to 'x'.
+        y_coord (str, optional): Name of the y coordinate. Defaults to 'y'.
+
+    Raises:
+        ValueError: If method is not supported.
+        ValueError: If 'bilinear' is used with 2D coordinates.
+
+    Returns:
+        sparse.csr_matrix: Weights of each station (row) and grid point
+                           (column, row-major order of the grid).
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(
+            "Interpolation method " + str(method) + " not supported. "
+            "Methods supported: " + str(INTERPOLATION_METHODS)
+        )
+
+    lsm_values = np.asarray(lsm.values)
+    n_stations = len(stations_md)
+    n_points = lsm_values.size
+
+    if method == "nearest":
+        points = get_model_points(lsm, stations_md, x_coord, y_coord)
+        rows, cols = np.array(list(points.values())).reshape(-1, 2).T
+        return sparse.csr_matrix(
+            (
+                np.ones(n_stations),
+                (np.arange(n_stations), np.ravel_multi_index((rows, cols), lsm.shape)),
+            ),
+            shape=(n_stations, n_points),
+        )
+
+    x_grid, y_grid, x_stat, y_stat, geographic = _project_stations(
+        lsm, stations_md, x_coord, y_coord
+    )
+
+    if method == "bilinear":
+        if x_grid.ndim != 1:
+            raise ValueError(
+                "Bilinear interpolation needs 1D coordinates. Use 'idw' for "
+                "grids with 2D coordinates."
+            )
+        row_0, row_1, w_row = _bilinear_weights(y_grid, y_stat)
+        col_0, col_1, w_col = _bilinear_weights(x_grid, x_stat)
+
+        indices = np.column_stack(
+            (
+                np.ravel_multi_index((row_0, col_0), lsm.shape),
+                np.ravel_multi_index((row_0, col_1), lsm.shape),
+                np.ravel_multi_index((row_1, col_0), lsm.shape),
+                np.ravel_multi_index((row_1, col_1), lsm.shape),
             )
+        )
+        weights = np.column_stack(
+            (
+                (1 - w_row) * (1 - w_col),
+                (1 - w_row) * w_col,
+                w_row * (1 - w_col),
+                w_row * w_col,
+            )
+        )
+    else:
+        grid_points = _grid_points(x_grid, y_grid, geographic)
+        candidates = np.arange(n_points)
+        if method == "knn_land":
+            candidates = np.flatnonzero(lsm_values.ravel() == 1)
+
+        nbrs = NearestNeighbors(n_neighbors=k, algorithm="kd_tree").fit(
+            grid_points[candidates]
+        )
+        distances, indices = nbrs.kneighbors(_to_points(x_stat, y_stat, geographic))
+        indices = candidates[indices]
+
+        if method == "idw":
+            weights = np.zeros_like(distances)
+            exact = distances[:, 0] == 0
+            weights[exact, 0] = 1.0
+            weights[~exact] = 1.0 / distances[~exact] ** power
+        else:
+            weights = np.ones_like(distances)
+
+    weights = weights / weights.sum(axis=1, keepdims=True)
+
+    return sparse.csr_matrix(
+        (
+            weights.ravel(),
+            (np.repeat(np.arange(n_stations), weights.shape[1]), indices.ravel()),
+        ),
+        shape=(n_stations, n_points),
+    )
+
+
+def get_grid_fingerprint(
+    lsm: xarray.DataArray, x_coord: str = "x", y_coord: str = "y"
+) -> str:
+    """Calculates a fingerprint of a model grid from its projection,
+    coordinates and land points, which determine the station model points.
+
+    Args:
+        lsm (xarray): Land-sea mask xarray.
+        x_coord (str, optional): Name of the x coordinate. Defaults to 'x'.
+        y_coord (str, optional): Name of the y coordinate. Defaults to 'y'.
+
+    Returns:
+        str: Hexadecimal fingerprint.
+    """
+    grid_hash = hashlib.sha1(str(lsm.rio.crs).encode())
+    for coord in [x_coord, y_coord]:
+        grid_hash.update(coord.encode())
+        grid_hash.update(np.asarray(lsm[coord].shape).tobytes())
+        grid_hash.update(np.ascontiguousarray(lsm[coord].values, dtype=float).tobytes())
+    grid_hash.update(np.ascontiguousarray(lsm.values == 1).tobytes())
+
+    return grid_hash.hexdigest()[:16]
+
+
+def get_stations_hash(stations_md) -> str:
+    """Calculates a hash of the station ids and coordinates.
+
+    Args:
+        stations_md (pd.Dataframe): Stations metadatada.
+
+    Returns:
+        str: Hexadecimal hash.
+    """
+    stations_hash = hashlib.sha1(
+        pd.util.hash_pandas_object(
+            stations_md[["station_id", "lat", "lon"]], index=False
+        ).to_numpy()
+    )
+
+    return stations_hash.hexdigest()[:16]
+
+
+def get_cached_model_points(
+    lsm: xarray.DataArray,
+    stations_md,
+    cache_dir: str,
+    x_coord: str = "x",
+    y_coord: str = "y",
+) -> dict:
+    """Determine model point position (row, col) for each station as
+    get_model_points, reusing the positions saved in cache_dir. Positions
+    are saved by grid fingerprint and stations hash, so they are only
+    calculated again if the grid or the stations change.
 
-            _, indices = nbrs.kneighbors(neigh_needed)
+    Args:
+        lsm (xarray): Land-sea mask xarray.
+        stations_md (pd.Dataframe): Stations metadatada.
+        cache_dir (str): Directory of the saved positions.
+        x_coord (str, optional): Name of the x coordinate, see
+                                 get_model_points. Defaults to 'x'.
+        y_coord (str, optional): Name of the y coordinate. Defaults to 'y'.
+
+    Returns:
+        dict: Model point position for each station following
+        {'station_id': (row, col)}.
+    """
+    cache_file = join(
+        cache_dir,
+        "points_"
+        + get_grid_fingerprint(lsm, x_coord, y_coord)
+        + "_"
+        + get_stations_hash(stations_md)
+        + ".parquet",
+    )
 
-            row, col = (
-                neigh_candidates[indices].flatten()[0],
-                neigh_candidates[indices].flatten()[1],
+    if exists(cache_file):
+        points = pd.read_parquet(cache_file)
+        return {
+            station_id: (row, col)
+            for station_id, row, col in zip(
+                points["station_id"], points["row"], points["col"]
             )
+        }
 
-        dictionary_row_col[stat.station_id] = (row, col)
+    dictionary_row_col = get_model_points(lsm, stations_md, x_coord, y_coord)
+
+    if not exists(cache_dir):
+        makedirs(cache_dir)
+
+    # Written to a temporary file of the process first, so other processes
+    # never read a partial file
+    tmp_file = cache_file + "." + str(getpid()) + ".tmp"
+    pd.DataFrame(
+        {
+            "station_id": list(dictionary_row_col),
+            "row": [int(row) for row, _ in dictionary_row_col.values()],
+            "col": [int(col) for _, col in dictionary_row_col.values()],
+        }
+    ).to_parquet(tmp_file)
+    replace(tmp_file, cache_file)
 
     return dictionary_row_col
+
+
+def extract_points(
+    fields: np.ndarray, rows: np.ndarray, cols: np.ndarray
+) -> np.ndarray:
+    """Extracts the values of multiple model points from a field or a stack of
+    fields (e.g. all lead times) with one indexing operation.
+
+    Args:
+        fields (np.ndarray): Model fields, with the grid in the last two
+                             dimensions (..., y, x).
+        rows (np.ndarray): Row of each point.
+        cols (np.ndarray): Column of each point.
+
+    Returns:
+        np.ndarray: Values with the points in the last dimension
+                    (..., points).
+    """
+    return np.asarray(fields)[..., rows, cols]
+
+
+def get_cached_interpolation_operator(
+    lsm: xarray.DataArray,
+    stations_md,
+    cache_dir: str,
+    method: str = "nearest",
+    x_coord: str = "x",
+    y_coord: str = "y",
+    **kwargs
+) -> sparse.csr_matrix:
+    """Builds the interpolation operator as get_interpolation_operator,
+    reusing the operator saved in cache_dir for the same grid, stations and
+    method parameters.
+
+    Args:
+        lsm (xarray): Land-sea mask xarray, with dimensions (y, x).
+        stations_md (pd.Dataframe): Stations metadatada.
+        cache_dir (str): Directory of the saved operators.
+        method (str, optional): Interpolation method. Defaults to 'nearest'.
+        x_coord (str, optional): Name of the x coordinate, see
+                                 get_interpolation_operator. Defaults to 'x'.
+        y_coord (str, optional): Name of the y coordinate. Defaults to 'y'.
+        **kwargs: Other arguments of get_interpolation_operator.
+
+    Returns:
+        sparse.csr_matrix: Weights of each station (row) and grid point
+                           (column).
+    """
+    params = "_".join(str(key) + str(kwargs[key]) for key in sorted(kwargs))
+    cache_file = join(
+        cache_dir,
+        "operator_"
+        + get_grid_fingerprint(lsm, x_coord, y_coord)
+        + "_"
+        + get_stations_hash(stations_md)
+        + "_"
+        + method
+        + ("_" + params if params else "")
+        + ".npz",
+    )
+
+    if exists(cache_file):
+        return sparse.load_npz(cache_file).tocsr()
+
+    operator = get_interpolation_operator(
+        lsm, stations_md, method, x_coord=x_coord, y_coord=y_coord, **kwargs
+    )
+
+    if not exists(cache_dir):
+        makedirs(cache_dir)
+
+    # Written to a temporary file of the process first, so other processes
+    # never read a partial file
+    tmp_file = cache_file + "." + str(getpid()) + ".tmp"
+    with open(tmp_file, "wb") as f:
+        sparse.save_npz(f, operator)
+    replace(tmp_file, cache_file)
+
+    return operator
+
+
+def interpolate_points(operator: sparse.csr_matrix, fields: np.ndarray) -> np.ndarray:
+    """Interpolates a field or a stack of fields (e.g. all lead times) to the
+    stations of an interpolation operator with one sparse matrix product.
+
+    Args:
+        operator (sparse.csr_matrix): Operator from get_interpolation_operator.
+        fields (np.ndarray): Model fields, with the grid in the last two
+                             dimensions (..., y, x).
+
+    Returns:
+        np.ndarray: Values with the stations in the last dimension
+                    (..., stations).
+    """
+    fields = np.asarray(fields)
+    grid_values = fields.reshape(-1, fields.shape[-2] * fields.shape[-1])
+
+    values = (operator @ grid_values.T).T
+
+    return values.reshape(fields.shape[:-2] + (operator.shape[0],))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from postproc.methods.dnn_runtime import DnnRuntime, export_dnn_weights
+
+tf = pytest.importorskip("tensorflow")
+
+
+def get_inputs(n_features, max_id, seed=0):
+    rng = np.random.default_rng(seed)
+    features = rng.normal(10, 5, size=(256, n_features)).astype(np.float32)
+    station_tokens = rng.integers(0, max_id + 1, size=(256, 1))
+
+    return features, station_tokens
+
+
+def assert_runtime_matches_keras(dnn_model, features, station_tokens, tmp_path):
+    weights_file = str(tmp_path / "weights.npz")
+    names = ["f" + str(i) for i in range(features.shape[1])]
+    export_dnn_weights(dnn_model, weights_file, names)
+    runtime = DnnRuntime(weights_file)
+
+    expected = dnn_model.predict([features, station_tokens], verbose=0)[:, 0]
+
+    assert runtime.features == names
+    np.testing.assert_allclose(
+        runtime.predict(features, station_tokens), expected, rtol=1e-5, atol=1e-4
+    )
+
+
+def test_runtime_matches_keras(tmp_path):
+    from postproc.methods.neural_networks import create_dnn_architecture
+
+    dnn_model = create_dnn_architecture(5, 3, 9)
+    features, station_tokens = get_inputs(5, 9)
+
+    assert_runtime_matches_keras(dnn_model, features, station_tokens, tmp_path)
+
+
+def test_runtime_matches_keras_normalization(tmp_path):
+    features, station_tokens = get_inputs(4, 6, seed=1)
+    norm_layer = tf.keras.layers.Normalization(axis=-1)
+    norm_layer.adapt(features)
+
+    features_in = tf.keras.layers.Input(shape=(4,))
+    id_in = tf.keras.layers.Input(shape=(1,))
+    emb = tf.keras.layers.Flatten()(tf.keras.layers.Embedding(7, 2)(id_in))
+    x = tf.keras.layers.Concatenate()([norm_layer(features_in), emb])
+    x = tf.keras.layers.Dense(16, activation="relu")(x)
+    x = tf.keras.layers.Dense(1, activation="linear")(x)
+    dnn_model = tf.keras.Model(inputs=[features_in, id_in], outputs=x)
+
+    assert_runtime_matches_keras(dnn_model, features, station_tokens, tmp_path)
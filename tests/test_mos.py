@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from sklearn.feature_selection import SequentialFeatureSelector
+from sklearn.linear_model import LinearRegression
+
+from postproc.io.parquet import to_wide_layout
+from postproc.methods.mos import (
+    Forecaster,
+    fit_statistics,
+    forward_stepwise_selection,
+    train_regressions,
+    train_statistics,
+)
+
+
+def get_training_data(n_runs=900, seed=0):
+    rng = np.random.default_rng(seed)
+    runs = pd.date_range("2020-01-01", periods=n_runs, freq="D")
+    values = {
+        "2t": rng.normal(15, 5, n_runs),
+        "2d": rng.normal(10, 5, n_runs),
+        "sp": rng.normal(1000, 10, n_runs),
+        # Lead time 0 has no accumulated precipitation
+        "tp": np.zeros(n_runs),
+    }
+    model_data = pd.DataFrame(
+        {
+            "station_id": "S01",
+            "run_datetime": np.tile(runs, len(values)),
+            "lead_time": 0,
+            "value": np.concatenate(list(values.values())),
+            "variable": np.repeat(list(values), n_runs),
+        }
+    )
+    station_data = pd.DataFrame(
+        {
+            "station_id": "S01",
+            "datetime": runs,
+            "value": 0.8 * values["2t"] + 0.1 * values["2d"] + rng.normal(0, 1, n_runs),
+            "variable": "2t",
+        }
+    )
+
+    return model_data, station_data
+
+
+def sklearn_support(x_values, y_values):
+    return (
+        SequentialFeatureSelector(
+            LinearRegression(),
+            n_features_to_select="auto",
+            tol=0.02,
+            scoring="r2",
+            direction="forward",
+        )
+        .fit(x_values, y_values)
+        .get_support()
+    )
+
+
+def test_forward_stepwise_selection_constant_predictor():
+    rng = np.random.default_rng(1)
+    x_values = np.column_stack(
+        (rng.normal(size=(1000, 3)), np.zeros(1000), np.full(1000, 7.0))
+    )
+    y_values = x_values[:, 0] + 0.5 * x_values[:, 1] + rng.normal(0, 0.5, 1000)
+
+    support = forward_stepwise_selection(x_values, y_values)
+
+    np.testing.assert_array_equal(support, sklearn_support(x_values, y_values))
+
+
+def test_forward_stepwise_selection_collinear_predictor():
+    rng = np.random.default_rng(2)
+    x_values = rng.normal(size=(1000, 3))
+    x_values = np.column_stack((x_values, 2 * x_values[:, 0]))
+    y_values = x_values[:, 0] + 0.5 * x_values[:, 1] + rng.normal(0, 0.5, 1000)
+
+    support = forward_stepwise_selection(x_values, y_values)
+
+    np.testing.assert_array_equal(support, sklearn_support(x_values, y_values))
+
+
+def test_train_regressions_constant_predictor():
+    model_data, station_data = get_training_data()
+
+    regressions = {
+        selector: train_regressions(
+            "S01", model_data, station_data, 0, "2t", selector=selector
+        )
+        for selector in ["gram", "sklearn"]
+    }
+
+    assert "tp" not in regressions["gram"]["predictors"]
+    assert list(regressions["gram"]["predictors"]) == list(
+        regressions["sklearn"]["predictors"]
+    )
+    np.testing.assert_allclose(
+        regressions["gram"]["coefs"], regressions["sklearn"]["coefs"]
+    )
+
+
+def test_fit_statistics_constant_predictor():
+    model_data, station_data = get_training_data()
+    statistics = train_statistics("S01", model_data, station_data, 0, "2t")
+    regression = train_regressions("S01", model_data, station_data, 0, "2t")
+
+    selected = fit_statistics(statistics)
+    refitted = fit_statistics(statistics, list(regression["predictors"]))
+
+    assert "tp" not in selected["predictors"]
+    np.testing.assert_allclose(refitted["coefs"], regression["coefs"])
+    np.testing.assert_allclose(refitted["intercept"], regression["intercept"])
+    # A regression keeping a constant predictor gets a zero coefficient
+    with_tp = fit_statistics(statistics, ["2t", "tp"])
+    assert with_tp["coefs"][1] == 0
+
+
+def test_forecast_runs_matches_forecast_point(tmp_path):
+    rng = np.random.default_rng(3)
+    variables = ["2t", "2d", "sp", "tp"]
+    stations = ["S01", "S02", "S03"]
+    regressions = []
+    for station_id in stations:
+        for lead_time in range(3):
+            predictors = sorted(rng.choice(variables, rng.integers(1, 4), False))
+            regressions.append(
+                {
+                    "score": 0.9,
+                    "coefs": rng.normal(size=len(predictors)).tolist(),
+                    "intercept": float(rng.normal()),
+                    "predictors": predictors,
+                    "lead_time": lead_time,
+                    "station_id": station_id,
+                    "predictand": "2t",
+                }
+            )
+    regression_file = str(tmp_path / "regressions.parquet")
+    pd.DataFrame(regressions).to_parquet(regression_file)
+
+    model_data = pd.MultiIndex.from_product(
+        [stations, pd.date_range("2024-01-01", periods=3), range(3), variables],
+        names=["station_id", "run_datetime", "lead_time", "variable"],
+    ).to_frame(index=False)
+    model_data["value"] = rng.normal(10, 5, len(model_data))
+
+    forecaster = Forecaster(regression_file)
+    for data in [model_data, to_wide_layout(model_data)]:
+        forecast = forecaster.forecast_runs(data, "2t", stations)
+
+        assert len(forecast) == 27
+        for row in forecast.itertuples():
+            run_data = data.loc[
+                (data["run_datetime"] == row.run_datetime)
+                & (data["lead_time"] == row.lead_time)
+            ]
+            np.testing.assert_allclose(
+                row.forecast, forecaster.forecast_point(row.station_id, run_data, "2t")
+            )
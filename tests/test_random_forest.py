@@ -0,0 +1,47 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from postproc.methods.random_forest import (
+    RandomForestStore,
+    flatten_forest,
+    predict_forest,
+)
+
+
+def get_rf_model(seed=0):
+    rng = np.random.default_rng(seed)
+    x_values = rng.normal(size=(500, 4))
+    y_values = x_values[:, 0] - 2 * x_values[:, 1] + rng.normal(0, 0.1, 500)
+
+    return RandomForestRegressor(n_estimators=20, random_state=seed).fit(
+        x_values, y_values
+    )
+
+
+def test_predict_forest_matches_sklearn():
+    rf_model = get_rf_model()
+    rng = np.random.default_rng(1)
+    x_values = rng.normal(size=(300, 4))
+    # Samples exactly on the split thresholds of the first tree
+    on_split = np.tile(rf_model.estimators_[0].tree_.threshold[:, None], (1, 4))
+
+    nodes, roots = flatten_forest(rf_model)
+
+    for samples in [x_values, on_split]:
+        np.testing.assert_array_equal(
+            predict_forest(nodes, roots, samples), rf_model.predict(samples)
+        )
+
+
+def test_store_predict_matches_sklearn(tmp_path):
+    rf_model = get_rf_model()
+    x_values = np.random.default_rng(2).normal(size=(100, 4))
+    store = RandomForestStore(str(tmp_path))
+
+    store.save("S01", 0, "2t", rf_model, ["2t", "2d", "sp", "tp"])
+
+    assert ("S01", 0, "2t") in store
+    assert store.load("S01", 0, "2t")[2] == ["2t", "2d", "sp", "tp"]
+    np.testing.assert_array_equal(
+        store.predict("S01", 0, "2t", x_values), rf_model.predict(x_values)
+    )